@@ -52,12 +52,34 @@ if app.config["REDO"]:
     manager.add_to_db("data/full.csv")
     logger.info("Repopulated table at %s", manager.db.engine)
 
-# Create new model object for the current session,
-# will be trained on what is on the db
+# Keyword arguments for training a model on what is on the db
+TRAIN_KWARGS = {"scale_const": 1000, "sum_column": "ingr_sum"}
+
+
+def new_model():
+    """Create the model object for the current session. Loads the trained
+    model artifact if one is configured, otherwise returns a new model
+    to be trained on what is on the db.
+
+    Returns:
+        `RecipeModel`: Model object
+    """
+    if app.config["MODEL_PATH"]:
+        return RecipeModel.load(
+            app.config["MODEL_PATH"],
+            mmap=app.config["MODEL_MMAP"],
+            cache_size=app.config["MODEL_CACHE_SIZE"],
+        )
+
+    return RecipeModel(
+        num_guesses=3,
+        num_ingredients=5,
+        cache_size=app.config["MODEL_CACHE_SIZE"],
+    )
+
+
 manager.bind_model(
-    RecipeModel(num_guesses=3, num_ingredients=5),
-    scale_const=1000,
-    sum_column="ingr_sum",
+    new_model(), pretrained=bool(app.config["MODEL_PATH"]), **TRAIN_KWARGS
 )
 
 
@@ -146,6 +168,29 @@ def prediction():
         return -1
 
 
+@app.route("/reload", methods=["POST"])
+def reload():
+    """Rebuild the model from the configured artifact or the db in the
+    background, and swap it in once ready. Disabled unless ALLOW_RELOAD
+    is set in the app config.
+
+    Returns:
+        JSON formatted dictionary with the reload status
+    """
+    if not app.config["ALLOW_RELOAD"]:
+        logger.warning("Model reload requested but not allowed")
+        return jsonify({"status": "disabled"}), 403
+
+    thread = manager.reload_model(
+        new_model, pretrained=bool(app.config["MODEL_PATH"]), **TRAIN_KWARGS
+    )
+    if thread is None:
+        return jsonify({"status": "busy"}), 409
+
+    logger.info("Model reload started")
+    return jsonify({"status": "started"}), 202
+
+
 @app.route("/convert", methods=["POST"])
 def conversion():
     """Process incoming post requests with ingredient name, return
@@ -0,0 +1,84 @@
+"""Compare the throughput of the cleaning engines on a raw data file.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_clean --input=data/raw.json
+"""
+
+import argparse
+import logging
+import time
+
+import pandas as pd
+import yaml
+
+from src.processing.clean import clean, convert_json
+
+logger = logging.getLogger("bench_clean")
+
+ENGINES = ["python", "pandas"]
+
+
+def bench(records, clean_kwargs, repeat=3):
+    """Time `clean` with every engine, keeping the best of a few runs
+
+    Args:
+        records (`list`): Raw recipes
+        clean_kwargs (`dict`): Arguments to `clean`, without the engine
+        repeat (int, optional): Runs per engine. Defaults to 3.
+
+    Returns:
+        `pandas.DataFrame`: Seconds, records per second and throughput
+        relative to the python engine, one row per engine
+    """
+    results = {}
+    outputs = {}
+    for engine in ENGINES:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[engine] = clean(records, **clean_kwargs, engine=engine)
+            times.append(time.perf_counter() - start)
+        results[engine] = min(times)
+
+    for engine in ENGINES[1:]:
+        if not outputs[engine].equals(outputs[ENGINES[0]]):
+            logger.error("Output of %s engine differs", engine)
+
+    report = pd.DataFrame({"seconds": pd.Series(results)})
+    report["records_per_second"] = len(records) / report["seconds"]
+    report["relative"] = report["seconds"][ENGINES[0]] / report["seconds"]
+
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark clean engines")
+    parser.add_argument(
+        "--input", default="data/raw.json", help="Path to raw data file"
+    )
+    parser.add_argument(
+        "--config",
+        default="config/config.yaml",
+        help="Path to configuration file",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per engine"
+    )
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.load(f, Loader=yaml.FullLoader)
+
+    # Time the regular expressions, not the on-disk cache
+    clean_kwargs = {
+        key: value
+        for key, value in config["processing"]["clean"].items()
+        if key not in ("cache_dir", "engine")
+    }
+
+    records = convert_json(args.input)
+    print(f"{len(records)} records from {args.input}")
+    print(bench(records, clean_kwargs, args.repeat).to_string())
@@ -0,0 +1,135 @@
+"""Compare the bincount featurizer with the former groupby pivot.
+
+Run from the root of the repository, on a cleaned file:
+
+    python -m benchmarks.bench_features --input=data/clean.csv
+
+or on a generated corpus of a given number of rows:
+
+    python -m benchmarks.bench_features --rows=10000000
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.processing.features import generate_train_df, ingr_sum
+
+logger = logging.getLogger("bench_features")
+
+
+def groupby_train_df(df, drop_rows=None, min_prevalence=100, sum_column=None):
+    """Former implementation of `generate_train_df`, for reference"""
+    cuisine_series = df.groupby("ingredient").cuisine.value_counts()
+    cuisinedf = cuisine_series.unstack().fillna(0)
+    if drop_rows:
+        cuisinedf = cuisinedf.drop(drop_rows, axis=0, errors="ignore")
+    cuisinedf[sum_column] = ingr_sum(cuisinedf)
+
+    return cuisinedf[cuisinedf.ingr_sum >= min_prevalence]
+
+
+def generate_clean_df(rows, ingredients=20000, cuisines=20, seed=0):
+    """Generate a cleaned dataframe with a long tail of rare ingredients
+
+    Args:
+        rows (int): Number of rows
+        ingredients (int, optional): Number of distinct ingredients.
+        Defaults to 20000.
+        cuisines (int, optional): Number of distinct cuisines.
+        Defaults to 20.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        `pandas.DataFrame`: Cleaned dataframe
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, ingredients + 1)
+    ingr_codes = rng.choice(ingredients, rows, p=weights / weights.sum())
+    cuisine_codes = rng.integers(0, cuisines, rows)
+
+    return pd.DataFrame(
+        {
+            "ingredient": np.array(
+                [f"ingredient {i}" for i in range(ingredients)], dtype=object
+            )[ingr_codes],
+            "cuisine": np.array(
+                [f"cuisine {i}" for i in range(cuisines)], dtype=object
+            )[cuisine_codes],
+        }
+    )
+
+
+def bench(df, features_kwargs, repeat=3):
+    """Time both featurizers, keeping the best of a few runs
+
+    Args:
+        df (`pandas.DataFrame`): Cleaned dataframe
+        features_kwargs (`dict`): Arguments to `generate_train_df`
+        repeat (int, optional): Runs per featurizer. Defaults to 3.
+
+    Returns:
+        `pandas.DataFrame`: Seconds, rows per second and speedup over the
+        groupby pivot, one row per featurizer
+    """
+    featurizers = {"groupby": groupby_train_df, "bincount": generate_train_df}
+    results = {}
+    outputs = {}
+    for name, featurizer in featurizers.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[name] = featurizer(df, **features_kwargs)
+            times.append(time.perf_counter() - start)
+        results[name] = min(times)
+
+    if not outputs["bincount"].equals(outputs["groupby"]):
+        logger.error("Outputs of the featurizers differ")
+
+    report = pd.DataFrame({"seconds": pd.Series(results)})
+    report["rows_per_second"] = len(df) / report["seconds"]
+    report["relative"] = report["seconds"]["groupby"] / report["seconds"]
+
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark featurizers")
+    parser.add_argument("--input", default=None, help="Path to clean.csv")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=10_000_000,
+        help="Rows to generate when no input is given",
+    )
+    parser.add_argument(
+        "--config",
+        default="config/config.yaml",
+        help="Path to configuration file",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per featurizer"
+    )
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.load(f, Loader=yaml.FullLoader)
+    features_kwargs = {
+        key: value
+        for key, value in config["processing"]["features"].items()
+        if key != "sparse"
+    }
+
+    if args.input is not None:
+        df = pd.read_csv(args.input)
+    else:
+        df = generate_clean_df(args.rows)
+
+    print(f"{len(df)} rows from {args.input or 'generated corpus'}")
+    print(bench(df, features_kwargs, args.repeat).to_string())
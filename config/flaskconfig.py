@@ -9,6 +9,19 @@ HOST = "0.0.0.0"
 SQLALCHEMY_ECHO = False  # If true, SQL for queries made will be printed
 REDO = False
 
+# Path to a trained model artifact (see `run.py pipeline train`). If set,
+# the app loads it at startup instead of retraining from the db
+MODEL_PATH = os.environ.get("MODEL_PATH")
+# Memory-map an artifact directory so every worker process on the host
+# shares one page-cache copy of the model matrices
+MODEL_MMAP = os.environ.get("MODEL_MMAP", "False").lower() == "true"
+# Number of predict + recommend results to cache per selection, 0 disables.
+# Cached results are computed on the sorted selection, so cuisines with
+# near-equal scores can rank differently than without the cache
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", 0))
+# Allow POST /reload to rebuild the model without restarting the app
+ALLOW_RELOAD = os.environ.get("ALLOW_RELOAD", "False").lower() == "true"
+
 # Components of connection string
 DB_HOST = os.environ.get("MYSQL_HOST")
 DB_PORT = os.environ.get("MYSQL_PORT")
@@ -2,16 +2,39 @@ import argparse
 import logging
 import yaml
 import os
-import json
 
 import pandas as pd
 
 from src.data_model import create_db
-from src.processing.clean import clean, convert_json
-from src.processing.features import generate_train_df
+from src.processing.clean import (
+    clean,
+    clean_sharded,
+    convert_json,
+    iter_json,
+)
+from src.processing.features import chunked_train_df, generate_train_df
 from src.recsys.model import RecipeModel
-from src.recsys.evaluate import generate_splits, get_accuracy
-from src.dataio import upload, download
+from src.recsys.sweep import get_path, sweep
+from src.recsys.evaluate import (
+    cross_validate,
+    evaluate_model,
+    split_records,
+    stream_splits,
+    write_metrics,
+)
+from src.dataio import download, iter_table, read_table, upload, write_table
+from src.pipeline import run_pipeline
+from src.cache import (
+    cache_path,
+    code_version,
+    config_hash,
+    file_hash,
+    is_fresh,
+    output_mtime,
+    step_manifest,
+    write_manifest,
+    write_pickle,
+)
 from config.flaskconfig import SQLALCHEMY_DATABASE_URI
 
 
@@ -33,6 +56,73 @@ logging.getLogger("s3fs").setLevel(logging.ERROR)
 # Set logger for this script
 logger = logging.getLogger("runner")
 
+# Config sections each pipeline step depends on, as dotted paths
+STEP_CONFIG = {
+    "clean": ["processing.clean"],
+    "features": ["processing.features"],
+    "train": ["model.initialize", "model.train"],
+    "model": [
+        "processing.clean",
+        "processing.features",
+        "model.initialize",
+        "model.train",
+        "model.evaluate.splits",
+    ],
+    "cv": [
+        "processing.clean",
+        "processing.features",
+        "model.initialize",
+        "model.train",
+        "model.evaluate.cv",
+    ],
+    "sweep": [
+        "processing",
+        "model.initialize",
+        "model.train",
+        "model.evaluate.splits",
+        "sweep",
+    ],
+    "all": [
+        "processing",
+        "model.initialize",
+        "model.train",
+        "model.evaluate.splits",
+        "pipeline",
+    ],
+}
+
+
+def get_step_outputs(step, config):
+    """Outputs of a pipeline step relative to `--output`. Only the config
+    sections of that step are read.
+
+    Args:
+        step (`str`): Name of the step
+        config (`dict`): Pipeline configuration
+
+    Returns:
+        `list`: Paths the step writes, `[""]` if it writes `--output` itself
+    """
+    if step in ("model", "cv", "all"):
+        evaluate_dir = config["model"]["evaluate"]["evaluate_dir"]
+        result_path = evaluate_dir + config["model"]["evaluate"]["result_path"]
+    if step == "model":
+        return [result_path]
+    if step == "cv":
+        return [evaluate_dir + config["model"]["evaluate"]["cv_result_path"]]
+    if step == "sweep":
+        return [config["sweep"]["result_path"]]
+    if step == "all":
+        outputs = [
+            config["pipeline"]["report_path"],
+            config["pipeline"]["model_path"],
+            result_path,
+            config["pipeline"]["features_path"],
+        ]
+        return [path for path in outputs if path is not None]
+
+    return [""]
+
 if __name__ == "__main__":
     # Add parsers for both creating a database and adding songs to it
     parser = argparse.ArgumentParser(
@@ -75,7 +165,15 @@ if __name__ == "__main__":
     sp_pipeline.add_argument(
         "step",
         help="Which step to run",
-        choices=["clean", "features", "model"],
+        choices=[
+            "clean",
+            "features",
+            "train",
+            "model",
+            "cv",
+            "sweep",
+            "all",
+        ],
     )
 
     # Input, output, config arguments for model pipeline
@@ -88,7 +186,32 @@ if __name__ == "__main__":
         help="Path to configuration file",
     )
     sp_pipeline.add_argument(
-        "--output", "-o", default=None, help="Path to save output CSV"
+        "--output",
+        "-o",
+        default=None,
+        help="Path to save output, Parquet if it ends in .parquet else CSV",
+    )
+    sp_pipeline.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes to clean the raw data with",
+    )
+    sp_pipeline.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Rows of the cleaned data to featurize at a time",
+    )
+    sp_pipeline.add_argument(
+        "--force",
+        action="store_true",
+        help="Run the step even if its inputs have not changed",
+    )
+    sp_pipeline.add_argument(
+        "--sqlalchemy_uri",
+        default=None,
+        help="Database to load the featurized data into, step all only",
     )
 
     args = parser.parse_args()
@@ -109,15 +232,55 @@ if __name__ == "__main__":
 
         with open(args.config, "r") as f:
             config = yaml.load(f, Loader=yaml.FullLoader)
-        if args.step == "clean":
+
+        # Outputs the step is skipped for if all their manifests are
+        # unchanged
+        step_outputs = (
+            [
+                args.output + path
+                for path in get_step_outputs(args.step, config)
+            ]
+            if args.output is not None
+            else []
+        )
+        manifest = None
+        # Loading a database is a side effect no output file records
+        if (
+            step_outputs
+            and args.input is not None
+            and args.sqlalchemy_uri is None
+        ):
+            manifest = step_manifest(
+                args.step,
+                args.input,
+                [get_path(config, path) for path in STEP_CONFIG[args.step]],
+            )
+
+        fresh = (
+            manifest is not None
+            and not args.force
+            and all(is_fresh(output, manifest) for output in step_outputs)
+        )
+        # Only record a manifest for an output this run writes
+        last_written = [output_mtime(output) for output in step_outputs]
+
+        if fresh:
+            logger.info(
+                "Inputs of step %s unchanged, reusing %s",
+                args.step,
+                ", ".join(step_outputs),
+            )
+        elif args.step == "clean":
             logger.debug("Attempting clean")
             # clouds.data -> clean.csv
-            data_dict = convert_json(args.input)
-            output = clean(data_dict, **config["processing"]["clean"])
+            data_dict = iter_json(args.input)
+            output = clean_sharded(
+                data_dict, args.workers, **config["processing"]["clean"]
+            )
             logger.info("Successfully cleaned input file %s, attempting save")
             try:
                 if args.output is not None:
-                    output.to_csv(args.output, index=False)
+                    write_table(output, args.output)
                     logger.info(
                         "Successfully saved file to output \
                         path %s",
@@ -129,10 +292,17 @@ if __name__ == "__main__":
         elif args.step == "features":
             # clean.csv -> full.csv
             logger.info("Preparing cleaned dataset for training")
-            input = pd.read_csv(args.input)
-            output = generate_train_df(
-                input, **config["processing"]["features"]
-            )
+            if args.chunksize is not None:
+                # Stream the cleaned data in chunks, bounding memory
+                chunks = iter_table(args.input, args.chunksize)
+                output = chunked_train_df(
+                    chunks, **config["processing"]["features"]
+                )
+            else:
+                input = read_table(args.input)
+                output = generate_train_df(
+                    input, **config["processing"]["features"]
+                )
             logger.info(
                 "Successfully completed training set generation\
                  from input %s",
@@ -140,68 +310,189 @@ if __name__ == "__main__":
             )
 
             if args.output is not None:
-                output.to_csv(args.output, index=True)
+                write_table(output, args.output, index=True)
                 logger.info(
                     "Successfully saved file to output \
                     path %s",
                     args.output,
                 )
 
-        elif args.step == "model":
-            # full.csv -> features/target -> results in a text file
-            logger.info("Generating train-test split")
-            train, test = generate_splits(
-                args.input, **config["model"]["evaluate"]["splits"]
-            )
-            logger.info("Created train-test split")
+        elif args.step == "train":
+            # full.csv -> trained model artifact
+            logger.info("Training model artifact from %s", args.input)
+            input = read_table(args.input, index_col=0)
 
+            model = RecipeModel(**config["model"]["initialize"])
+            model.train(input, **config["model"]["train"])
+
+            if args.output is not None:
+                model.save(args.output)
+                logger.info(
+                    "Successfully saved model artifact to output \
+                    path %s",
+                    args.output,
+                )
+
+        elif args.step == "model":
+            # raw.json -> features/target -> results in a text file
             output_path = (
                 args.output + config["model"]["evaluate"]["evaluate_dir"]
             )
+            trainset_path = (
+                output_path + config["model"]["evaluate"]["trainset_path"]
+            )
+            testset_path = (
+                output_path + config["model"]["evaluate"]["testset_path"]
+            )
 
             # Create evaluation path
             if not os.path.isdir(output_path):
                 os.mkdir(output_path)
 
-            # Save training set
-            with open(
-                output_path + config["model"]["evaluate"]["trainset_path"], "w"
-            ) as f:
-                f.write(json.dumps(train))
-                logger.info("Saving training set to %s", output_path)
-
-            # Save test set
-            with open(
-                output_path + config["model"]["evaluate"]["testset_path"], "w"
-            ) as f:
-                f.write(json.dumps(test))
-                logger.info("Saving test set to %s", output_path)
-
-            # Clean & featurize training set
-            data_dict = convert_json(
-                output_path + config["model"]["evaluate"]["trainset_path"]
-            )
-            train = clean(
-                data_dict,
-                **config["processing"]["clean"],
+            # Stream records straight into the train and test sets
+            logger.info("Generating train-test split")
+            stream_splits(
+                args.input,
+                trainset_path,
+                testset_path,
+                **config["model"]["evaluate"]["splits"],
             )
-            train = generate_train_df(
-                train, **config["processing"]["features"]
+            logger.info("Saved train and test sets to %s", output_path)
+
+            # Clean & featurize training set, unless cached for the same
+            # train set, config and code
+            cache_dir = output_path + config["model"]["evaluate"]["cache_dir"]
+            os.makedirs(cache_dir, exist_ok=True)
+            train_key = config_hash(
+                file_hash(trainset_path),
+                config["processing"]["clean"],
+                config["processing"]["features"],
+                code_version(),
             )
+            train_path = cache_path(cache_dir, "features", train_key)
+            if os.path.exists(train_path):
+                train = pd.read_pickle(train_path)
+                logger.info("Loaded cached train features %s", train_path)
+            else:
+                train = clean(
+                    iter_json(trainset_path),
+                    **config["processing"]["clean"],
+                )
+                train = generate_train_df(
+                    train, **config["processing"]["features"]
+                )
+                write_pickle(train, train_path)
+            test = convert_json(testset_path)
 
             # Create and train model
             model = RecipeModel(**config["model"]["initialize"])
             model.train(train, **config["model"]["train"])
 
             # Calculate accuracy
-            acc = get_accuracy(model, test)
-
-            # Write results to file
-            with open(
-                output_path + config["model"]["evaluate"]["result_path"], "w"
-            ) as f:
-                f.write(f"Accuracy: {str(acc)}")
-                logger.info("Saving results file at %s", output_path)
+            metrics = evaluate_model(model, test)
+
+            # Write results to file, evaluate_model logs why it has none
+            if metrics is not None:
+                write_metrics(
+                    metrics,
+                    output_path + config["model"]["evaluate"]["result_path"],
+                )
+
+        elif args.step == "cv":
+            # raw.json -> k-fold metrics report in a CSV file
+            logger.info("Running k-fold cross-validation on %s", args.input)
+            data_dict = convert_json(args.input)
+            report = cross_validate(
+                data_dict,
+                config["processing"]["clean"],
+                config["processing"]["features"],
+                config["model"]["initialize"],
+                config["model"]["train"],
+                **config["model"]["evaluate"]["cv"],
+            )
+
+            output_path = (
+                args.output + config["model"]["evaluate"]["evaluate_dir"]
+            )
+
+            # Create evaluation path
+            if not os.path.isdir(output_path):
+                os.mkdir(output_path)
+
+            report.to_csv(
+                output_path + config["model"]["evaluate"]["cv_result_path"]
+            )
+            logger.info("Saving cross-validation report at %s", output_path)
+
+        elif args.step == "sweep":
+            # raw.json -> metrics of every grid combination in a CSV file
+            logger.info("Generating train-test split")
+            splits = config["model"]["evaluate"]["splits"]
+            # Same hash split as the model step, so results are comparable
+            train, test = split_records(iter_json(args.input), **splits)
+
+            # Cached artifacts are only valid for the same train set
+            fingerprint = config_hash(
+                file_hash(args.input), splits, code_version()
+            )
+            results = sweep(
+                train,
+                test,
+                config,
+                config["sweep"]["grid"],
+                cache_dir=args.output + config["sweep"]["cache_dir"],
+                fingerprint=fingerprint,
+                workers=config["sweep"]["workers"],
+            )
+
+            results.to_csv(
+                args.output + config["sweep"]["result_path"], index=False
+            )
+            logger.info("Saving sweep results at %s", args.output)
+
+        elif args.step == "all":
+            # raw.json -> model artifact, results and stage report, in memory
+            output_path = (
+                args.output + config["model"]["evaluate"]["evaluate_dir"]
+            )
+
+            # Create evaluation path
+            if not os.path.isdir(output_path):
+                os.mkdir(output_path)
+
+            features_path = config["pipeline"]["features_path"]
+            report = run_pipeline(
+                args.input,
+                config,
+                model_path=args.output + config["pipeline"]["model_path"],
+                result_path=(
+                    output_path + config["model"]["evaluate"]["result_path"]
+                ),
+                features_path=(
+                    args.output + features_path
+                    if features_path is not None
+                    else None
+                ),
+                engine_string=args.sqlalchemy_uri,
+                workers=args.workers,
+            )
+
+            report.to_csv(args.output + config["pipeline"]["report_path"])
+            logger.info(
+                "Pipeline took %.2f seconds, peak RSS %.1f MiB",
+                report["seconds"].sum(),
+                report["peak_rss_mb"].max(),
+            )
+
+        if manifest is not None and not fresh:
+            for output, mtime in zip(step_outputs, last_written):
+                if output_mtime(output) != mtime:
+                    write_manifest(output, manifest)
+                    logger.debug(
+                        "Recorded manifest of step %s for %s",
+                        args.step,
+                        output,
+                    )
 
     else:
         parser.print_help()
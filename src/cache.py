@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def config_hash(*parts):
+    """Hash configuration values into a short key that is stable across
+    runs and processes
+
+    Args:
+        *parts (any): JSON-serializable values, e.g. config sections
+
+    Returns:
+        str: Hexadecimal digest of the values
+    """
+    blob = json.dumps(parts, sort_keys=True, default=str)
+
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Hash the contents of a file, reading it in chunks
+
+    Args:
+        path (`str`): Path to the file
+        chunk_size (int, optional): Bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+        str: Hexadecimal digest of the file contents
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    logger.debug("Hashed file at %s", path)
+
+    return digest.hexdigest()[:16]
+
+
+def cache_path(cache_dir, stage, key, extension=".pkl"):
+    """Path of a cached artifact
+
+    Args:
+        cache_dir (`str`): Cache directory
+        stage (`str`): Name of the stage producing the artifact
+        key (`str`): Hash of everything the artifact depends on
+        extension (`str`, optional): File extension. Defaults to ".pkl".
+
+    Returns:
+        str: Path to the artifact inside the cache directory
+    """
+    return os.path.join(cache_dir, f"{stage}-{key}{extension}")
+
+
+def write_pickle(df, path):
+    """Pickle a dataframe atomically, so that concurrent readers never see
+    a partially written artifact
+
+    Args:
+        df (`pandas.DataFrame`): Dataframe to write
+        path (`str`): Destination path
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, path)
+    logger.debug("Cached artifact at %s", path)
+
+
+def write_json(obj, path):
+    """Write an object as JSON atomically, so that concurrent readers never
+    see a partially written file
+
+    Args:
+        obj (any): JSON-serializable object
+        path (`str`): Destination path
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+    logger.debug("Cached artifact at %s", path)
+
+
+def tree_hash(directory, extension=""):
+    """Hash the contents and relative paths of the files in a directory tree
+
+    Args:
+        directory (`str`): Root of the tree
+        extension (`str`, optional): Only hash files ending in this
+        extension. Defaults to "", every file.
+
+    Returns:
+        str: Hexadecimal digest of the tree
+    """
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(extension):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, directory).encode())
+                digest.update(file_hash(path).encode())
+
+    return digest.hexdigest()[:16]
+
+
+def path_hash(path):
+    """Hash a step input or output, either a single file or a directory
+    of files
+
+    Args:
+        path (`str`): Path to the file or directory
+
+    Returns:
+        str: Hexadecimal digest of the contents
+    """
+    if os.path.isdir(path):
+        return tree_hash(path)
+
+    return file_hash(path)
+
+
+def code_version(package_dir=os.path.dirname(os.path.abspath(__file__))):
+    """Hash the Python sources of a package, so that cached results are
+    recomputed whenever the code producing them changes
+
+    Args:
+        package_dir (`str`, optional): Package directory. Defaults to the
+        directory of this module.
+
+    Returns:
+        str: Hexadecimal digest of the sources
+    """
+    return tree_hash(package_dir, ".py")
+
+
+def manifest_path(output):
+    """Path of the manifest recorded next to a step output
+
+    Args:
+        output (`str`): Path to the step output
+
+    Returns:
+        str: Path to the manifest
+    """
+    return f"{output}.manifest.json"
+
+
+def step_manifest(step, input_path, config_sections):
+    """Describe everything the output of a pipeline step depends on
+
+    Args:
+        step (`str`): Name of the step
+        input_path (`str`): Path to the step input
+        config_sections (`list`): Config values the step reads
+
+    Returns:
+        `dict`: Step name, input hash, config hash and code version
+    """
+    return {
+        "step": step,
+        "input": path_hash(input_path),
+        "config": config_hash(*config_sections),
+        "code": code_version(),
+    }
+
+
+def is_fresh(output, manifest):
+    """Check whether a step output was produced from the same inputs,
+    config and code, and has not been modified since
+
+    Args:
+        output (`str`): Path to the step output
+        manifest (`dict`): Manifest of the step about to run
+
+    Returns:
+        bool: True if the output can be reused
+    """
+    path = manifest_path(output)
+    if not os.path.exists(output) or not os.path.exists(path):
+        return False
+
+    with open(path, "r") as f:
+        recorded = json.load(f)
+
+    return recorded == {**manifest, "output": path_hash(output)}
+
+
+def output_mtime(output):
+    """Modification time of a step output, to tell whether a step wrote it.
+    The output of a directory is its most recently modified file.
+
+    Args:
+        output (`str`): Path to the step output, or None
+
+    Returns:
+        int: Modification time in nanoseconds, None if there is no output
+    """
+    if output is None or not os.path.exists(output):
+        return None
+    if os.path.isdir(output):
+        return max(
+            (
+                os.stat(os.path.join(root, name)).st_mtime_ns
+                for root, _, files in os.walk(output)
+                for name in files
+            ),
+            default=None,
+        )
+
+    return os.stat(output).st_mtime_ns
+
+
+def write_manifest(output, manifest):
+    """Record the manifest of a step next to its output
+
+    Args:
+        output (`str`): Path to the step output
+        manifest (`dict`): Manifest of the step that produced the output
+    """
+    manifest = {**manifest, "output": path_hash(output)}
+    write_json(manifest, manifest_path(output))
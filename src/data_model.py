@@ -1,5 +1,6 @@
 import logging
 import csv
+import threading
 
 import pandas as pd
 import sqlalchemy
@@ -9,6 +10,8 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, String
 from flask_sqlalchemy import SQLAlchemy
 
+from src.dataio import read_table, table_format
+
 # Set up module logger
 logger = logging.getLogger(__name__)
 
@@ -146,6 +149,8 @@ class SessionManager:
                 "Need either an engine string or a Flask app to initialize"
             )
 
+        self._reload_lock = threading.Lock()
+
     def close(self):
         """Closes session
         Returns: None
@@ -156,7 +161,8 @@ class SessionManager:
         """Populate table with ingredients.
 
         Args:
-            datapath (`str`): path to cleaned dataset (full)
+            datapath (`str`): path to cleaned dataset (full), a Parquet
+            file if it ends in .parquet, CSV otherwise
             header (bool, optional): If true, csv file has
             a header row. True by default.
 
@@ -164,6 +170,11 @@ class SessionManager:
             of the cuisines, and a variable at the end that
             has the sum of values.
         """
+        if table_format(datapath) == "parquet":
+            # Typed columns, no text to parse
+            self.add_df_to_db(read_table(datapath))
+            return
+
         with open(datapath, "r") as f:
             logger.info("Opened csv file at %s", datapath)
             # Turn csv file into list of lists
@@ -174,6 +185,27 @@ class SessionManager:
             del rows[0]
             logger.debug("Removed header row")
 
+        self._insert_rows(rows)
+
+    def add_df_to_db(self, df):
+        """Populate table with ingredients from a dataframe in memory.
+
+        Args:
+            df (`pandas.DataFrame`): Featurized dataset (full), keyed by
+            ingredient, with a column for each of the cuisines and the sum
+            of values as the last column
+        """
+        rows = df.reset_index().values.tolist()
+        logger.info("Obtained %i records", len(rows))
+        self._insert_rows(rows)
+
+    def _insert_rows(self, rows):
+        """Insert ingredient rows and commit.
+
+        Args:
+            rows (`list`): Lists of the ingredient name, a value for each
+            of the cuisines and the sum of values
+        """
         # Initialize empty list, populate with dicts for each entry
         all_ingr = []
 
@@ -201,28 +233,87 @@ class SessionManager:
         except sqlalchemy.exc.DatabaseError:
             logger.error("Connection timed out!")
 
-    def bind_model(self, model, **kwargs):
+    def bind_model(self, model, pretrained=False, **kwargs):
         """Bind a model object to session manager
 
         Args:
             model (any): Generic model object
+            pretrained (bool, optional): If True, the model is already
+            trained (e.g. loaded from an artifact) and is bound as is,
+            without querying the db. Defaults to False.
+        """
+        if not pretrained:
+            model = self._train_model(model, self.session.bind, **kwargs)
+            if model is None:
+                return None
+
+        self.model = model
+        logger.info("Assigned a new model to subject of type %s", type(model))
+
+    def reload_model(self, build, pretrained=False, **kwargs):
+        """Replace the bound model without interrupting requests. A new
+        model is built (and trained on the db unless pretrained) in a
+        background thread, then swapped in with a single assignment.
+        Requests already holding the previous model finish with it.
+
+        Args:
+            build (callable): Returns the new model object, e.g. an
+            untrained model or one loaded from an artifact
+            pretrained (bool, optional): If True, the built model is bound
+            without training. Defaults to False.
+
+        Returns:
+            `threading.Thread`: Reload thread, None if a reload is
+            already running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            logger.warning("Model reload already in progress, skipping")
+            return None
+
+        # Engines are thread safe, sessions are not
+        bind = self.session.bind
+
+        def reload():
+            try:
+                model = build()
+                if not pretrained:
+                    model = self._train_model(model, bind, **kwargs)
+                if model is not None:
+                    self.model = model
+                    logger.info(
+                        "Reloaded model of type %s", type(self.model)
+                    )
+            except Exception as e:
+                logger.error("Model reload failed, keeping current: %s", e)
+            finally:
+                self._reload_lock.release()
+
+        thread = threading.Thread(target=reload, daemon=True)
+        thread.start()
+        return thread
+
+    def _train_model(self, model, bind, **kwargs):
+        """Train a model on the `ingredients` table
+
+        Args:
+            model (any): Generic model object
+            bind (`sqlalchemy.engine.Engine`): Engine to read the table from
+
+        Returns:
+            any: Trained model, None if the table could not be read
         """
         # Get train df from `ingredients` table
         try:
-            self.df = pd.read_sql(
-                "SELECT * FROM ingredients", self.session.bind
-            )
+            df = pd.read_sql("SELECT * FROM ingredients", bind)
         except ArgumentError:
-            logger.error(
-                "Invalid DB, please reset the db %s", self.session.bind
-            )
+            logger.error("Invalid DB, please reset the db %s", bind)
             return None
 
         # Prepare for training
-        traindf = self.df.set_index(keys=self.df.name).drop(
+        traindf = df.set_index(keys=df.name).drop(
             ["cuisineid", "name"], axis=1
         )
 
         model.train(traindf, **kwargs)
-        self.model = model
-        logger.info("Assigned a new model to subject of type %s", type(model))
+        self.df = df
+        return model
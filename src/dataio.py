@@ -1,11 +1,17 @@
 import logging
+import os
 import re
 
 import boto3
+import numpy as np
+import pandas as pd
 from botocore.exceptions import NoCredentialsError
 
 logger = logging.getLogger(__name__)
 
+# File extensions of the columnar format, any other extension is CSV
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
 
 def parse_s3(s3path):
     """Parses a raw S3 path to extract bucket name and
@@ -78,3 +84,110 @@ def download(bucketname=None, path_from=None, path_to=None, s3path=None):
         logger.error("File does not exist on the specified path")
     except NoCredentialsError:
         logger.error("AWS credentials not set as env variables")
+
+
+def table_format(path, fmt=None):
+    """Format of a table file, from its extension unless given
+
+    Args:
+        path (`str`): Path to the table file
+        fmt (`str`, optional): "csv" or "parquet". Defaults to None, picked
+        from the file extension.
+
+    Returns:
+        str: "csv" or "parquet"
+    """
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = "parquet" if extension in PARQUET_EXTENSIONS else "csv"
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unknown table format {fmt}")
+
+    return fmt
+
+
+def columnar(df):
+    """Convert a dataframe to the types stored in the columnar format:
+    strings become dictionary-encoded categoricals and whole-number float
+    columns, e.g. counts, become integers
+
+    Args:
+        df (`pandas.DataFrame`): Dataframe to convert
+
+    Returns:
+        `pandas.DataFrame`: Converted dataframe
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_sparse(values):
+            values = values.sparse.to_dense()
+        if pd.api.types.is_object_dtype(values):
+            values = values.astype("category")
+        elif pd.api.types.is_float_dtype(values):
+            array = values.to_numpy()
+            if np.isfinite(array).all() and (array % 1 == 0).all():
+                values = values.astype(np.int64)
+        df[column] = values
+
+    return df
+
+
+def write_table(df, path, index=False, fmt=None):
+    """Write a dataframe as CSV or as Parquet, picked from the file
+    extension unless given. Parquet keeps the column types, so the next
+    stage reads it back without parsing text.
+
+    Args:
+        df (`pandas.DataFrame`): Dataframe to write
+        path (`str`): Destination path
+        index (bool, optional): If True, writes the index too. Defaults to
+        False.
+        fmt (`str`, optional): "csv" or "parquet". Defaults to None, picked
+        from the file extension.
+    """
+    if table_format(path, fmt) == "parquet":
+        columnar(df).to_parquet(path, index=index)
+    else:
+        df.to_csv(path, index=index)
+    logger.debug("Wrote %i rows to %s", len(df), path)
+
+
+def read_table(path, index_col=None, fmt=None):
+    """Read a dataframe written by `write_table`
+
+    Args:
+        path (`str`): Path to the table file
+        index_col (int, optional): Column of a CSV file to use as the index.
+        Parquet files keep their index. Defaults to None.
+        fmt (`str`, optional): "csv" or "parquet". Defaults to None, picked
+        from the file extension.
+
+    Returns:
+        `pandas.DataFrame`: Table contents
+    """
+    if table_format(path, fmt) == "parquet":
+        return pd.read_parquet(path)
+
+    return pd.read_csv(path, index_col=index_col)
+
+
+def iter_table(path, chunksize, fmt=None):
+    """Read a table file a number of rows at a time
+
+    Args:
+        path (`str`): Path to the table file
+        chunksize (int): Rows per chunk
+        fmt (`str`, optional): "csv" or "parquet". Defaults to None, picked
+        from the file extension.
+
+    Yields:
+        `pandas.DataFrame`: Consecutive chunks of the table
+    """
+    if table_format(path, fmt) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
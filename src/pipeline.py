@@ -0,0 +1,144 @@
+import contextlib
+import logging
+import resource
+import sys
+import time
+
+import pandas as pd
+
+from src.data_model import SessionManager, create_db
+from src.dataio import write_table
+from src.processing.clean import clean_sharded, concat_clean, iter_json
+from src.processing.features import generate_train_df
+from src.recsys.evaluate import evaluate_model, split_records, write_metrics
+from src.recsys.model import RecipeModel, is_sparse
+
+logger = logging.getLogger(__name__)
+
+# ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss():
+    """Peak resident set size of this process and of its finished child
+    processes, e.g. cleaning workers
+
+    Returns:
+        float, float: Peak RSS of the process and of its children in MiB
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    return own * RSS_UNIT / 2 ** 20, children * RSS_UNIT / 2 ** 20
+
+
+@contextlib.contextmanager
+def stage(report, name):
+    """Time a pipeline stage and record its wall time and the peak RSS
+    reached by the end of it
+
+    Args:
+        report (`list`): Stage records, appended to
+        name (`str`): Name of the stage
+    """
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    own, children = peak_rss()
+    report.append(
+        {
+            "stage": name,
+            "seconds": seconds,
+            "peak_rss_mb": own,
+            "children_peak_rss_mb": children,
+        }
+    )
+    logger.info(
+        "Stage %s took %.2f seconds, peak RSS %.1f MiB", name, seconds, own
+    )
+
+
+def run_pipeline(
+    input_path,
+    config,
+    model_path,
+    result_path,
+    features_path=None,
+    engine_string=None,
+    workers=1,
+):
+    """Run the whole model pipeline in one process. The raw data is read
+    and cleaned once; the cleaned and featurized tables are handed between
+    stages in memory and only the final artifacts are written.
+
+    The model evaluated on the test split is trained like in the `model`
+    step and the saved model on the whole data like in the `train` step,
+    with the same results as running those steps one after the other.
+    With `processing.features.sparse`, only the evaluated model is sparse:
+    the saved model is trained on dense counts, since sparse models cannot
+    be saved.
+
+    Args:
+        input_path (`str`): Path to the raw JSON or JSONL data
+        config (`dict`): Pipeline configuration
+        model_path (`str`): Path to save the model trained on all the data
+        result_path (`str`): Path to save the evaluation metrics
+        features_path (`str`, optional): Path to save the featurized data,
+        Parquet if it ends in .parquet else CSV. Defaults to None, not
+        saved.
+        engine_string (`str`, optional): URI of a database to load the
+        featurized data into. Defaults to None, not loaded.
+        workers (int, optional): Number of processes to clean the raw data
+        with. Defaults to 1.
+
+    Returns:
+        `pandas.DataFrame`: Wall time and peak RSS of each stage
+    """
+    report = []
+    clean_kwargs = config["processing"]["clean"]
+    features_kwargs = config["processing"]["features"]
+
+    with stage(report, "read"):
+        train, test = split_records(
+            iter_json(input_path), **config["model"]["evaluate"]["splits"]
+        )
+
+    with stage(report, "clean"):
+        # Each record is cleaned once, the full data is the union of both
+        train_clean = clean_sharded(train, workers, **clean_kwargs)
+        full_clean = concat_clean(
+            [train_clean, clean_sharded(test, workers, **clean_kwargs)]
+        )
+
+    with stage(report, "features"):
+        train_features = generate_train_df(train_clean, **features_kwargs)
+        full_features = generate_train_df(full_clean, **features_kwargs)
+        del train_clean, full_clean
+        # Sparse models cannot be saved, train the saved one on dense counts
+        if is_sparse(full_features):
+            full_features = full_features.sparse.to_dense()
+
+    with stage(report, "train"):
+        eval_model = RecipeModel(**config["model"]["initialize"])
+        eval_model.train(train_features, **config["model"]["train"])
+        model = RecipeModel(**config["model"]["initialize"])
+        model.train(full_features, **config["model"]["train"])
+
+    with stage(report, "evaluate"):
+        metrics = evaluate_model(eval_model, test)
+
+    with stage(report, "save"):
+        model.save(model_path)
+        if metrics is not None:
+            write_metrics(metrics, result_path)
+        if features_path is not None:
+            write_table(full_features, features_path, index=True)
+
+    if engine_string is not None:
+        with stage(report, "load_db"):
+            create_db(engine_string)
+            manager = SessionManager(engine_string=engine_string)
+            manager.add_df_to_db(full_features)
+            manager.close()
+
+    return pd.DataFrame(report).set_index("stage")
@@ -1,14 +1,38 @@
 from json.decoder import JSONDecodeError
+import array
+import itertools
 import logging
 import json
+import multiprocessing
+import os
 import re
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src.cache import cache_path, config_hash, write_json
 
 logger = logging.getLogger(__name__)
 
+# Records shared by the cleaning worker processes, set once per worker by
+# _init_clean_worker
+_clean_state = {}
+
+
+def compile_patterns(patterns):
+    """Compile regular expression patterns once for repeated matching
+
+    Args:
+        patterns (`list`): List of regex patterns, as strings or compiled
+
+    Returns:
+        `list`: List of compiled regex patterns, in the same order
+    """
+    return [re.compile(pattern) for pattern in patterns]
 
-def clean_ingr(items, patterns, verbose=False):
+
+def clean_ingr(items, patterns, verbose=False, memo=None):
     """For a list of strings, remove segments that match regular expression
     patterns specified
 
@@ -17,31 +41,44 @@ def clean_ingr(items, patterns, verbose=False):
         patterns (`list`): List of regex patterns to match and remove
         verbose (bool, optional): When true, prints out warning logs
         for every removal. Defaults to False.
+        memo (`dict`, optional): Cleaned strings by raw string, shared
+        across calls with the same patterns so that every distinct string
+        is only cleaned once. Defaults to None, no sharing.
 
     Returns:
         `list`: List of strings with regex patterns removed
     """
+    patterns = compile_patterns(patterns)
+    if memo is None:
+        memo = {}
+
     fixed_items = []
 
     # Check for every item in the list
     for item in items:
+        if item in memo:
+            fixed_items.append(memo[item])
+            continue
+
+        raw = item
         # Check for every pattern
         for pattern in patterns:
             # if match found, replace with empty str
-            if re.search(pattern, item):
+            if pattern.search(item):
                 try:
-                    fixed = re.sub(pattern, "", item)
+                    fixed = pattern.sub("", item)
                 except TypeError:
                     logger.warning(
                         "String type expected in record,\
                         attempting converting to string"
                     )
-                    fixed = re.sub(pattern, "", str(item))
+                    fixed = pattern.sub("", str(item))
                 # Print warnings
                 if verbose:
                     logger.warning("Exchanged %s to: %s", item, fixed)
                 item = fixed
 
+        memo[raw] = item
         fixed_items.append(item)
 
     return fixed_items
@@ -70,25 +107,187 @@ def convert_json(data_path):
     """Convert json to a Python dictionary
 
     Args:
-        data_path (str): Path to JSON file
+        data_path (str): Path to JSON or newline-delimited JSON file
 
     Returns:
         dict: Dictionary
     """
     try:
-        with open(data_path, "r") as file:
-            data = file.read()
-            logger.info("Read file from %s", data_path)
+        obj = list(iter_json(data_path))
     except JSONDecodeError:
         logger.error("Invalid file provided at %s", data_path)
+        return None
 
-    # Parse file
-    obj = json.loads(data)
     logger.info("Obtained %i records", len(obj))
 
     return obj
 
 
+def iter_json(data_path, chunk_size=1 << 16):
+    """Iterate over the records of a JSON array file, or of a
+    newline-delimited JSON file with one record per line, reading the file
+    in chunks instead of all at once
+
+    Args:
+        data_path (str): Path to JSON or newline-delimited JSON file
+        chunk_size (int, optional): Characters read at a time. Defaults
+        to 65536.
+
+    Yields:
+        any: Parsed records, in file order. Raises `JSONDecodeError` on
+        reaching an invalid record.
+    """
+    with open(data_path, "r") as file:
+        buffer = file.read(chunk_size)
+        if buffer.lstrip().startswith("["):
+            records = _iter_array(file, buffer.lstrip(), chunk_size)
+        else:
+            file.seek(0)
+            records = _iter_lines(file)
+
+        count = 0
+        for record in records:
+            count += 1
+            yield record
+
+    logger.info("Read %i records from %s", count, data_path)
+
+
+def _iter_array(file, buffer, chunk_size):
+    """Iterate over the elements of a JSON array
+
+    Args:
+        file (file object): File positioned after the buffer
+        buffer (str): Start of the file, from the opening bracket on
+        chunk_size (int): Characters read at a time
+
+    Yields:
+        any: Parsed elements of the array
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[\s,]*")
+    pos = 1
+
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if buffer.startswith("]", pos):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except JSONDecodeError:
+            # Record runs past the buffer, read the next chunk
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        pos = end
+        yield obj
+
+
+def _iter_lines(file):
+    """Iterate over the records of newline-delimited JSON, skipping blank
+    lines
+
+    Args:
+        file (file object): File positioned at the start
+
+    Yields:
+        any: Parsed records
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def categorical(codes, categories):
+    """Build a categorical column with sorted categories from integer
+    codes into categories numbered in order of appearance
+
+    Args:
+        codes (`array.array`): Codes of every row, -1 for missing values
+        categories (`dict`): Category to its code
+
+    Returns:
+        `pandas.Categorical`: Column values
+    """
+    categories = list(categories)
+    order = sorted(range(len(categories)), key=categories.__getitem__)
+
+    # Map codes from order of appearance to sorted order, -1 stays -1
+    remap = np.full(len(categories) + 1, -1)
+    remap[order] = np.arange(len(categories))
+    codes = remap[np.frombuffer(codes, dtype=np.dtype(codes.typecode))]
+
+    return pd.Categorical.from_codes(
+        codes, categories=[categories[i] for i in order]
+    )
+
+
+def memo_file(cache_dir, patterns, remove_words):
+    """Path of the file caching cleaned ingredient names. Cleaned names
+    only stay valid for the same patterns and remove words.
+
+    Args:
+        cache_dir (str): Cache directory
+        patterns (array-like): Regular expression patterns of `clean`
+        remove_words (array-like): Remove words of `clean`
+
+    Returns:
+        str: Path to the JSON file
+    """
+    return cache_path(
+        cache_dir,
+        "ingredients",
+        config_hash(patterns, remove_words),
+        extension=".json",
+    )
+
+
+def load_memo(path):
+    """Load cleaned ingredient names cached by earlier runs
+
+    Args:
+        path (str): Path to the JSON file
+
+    Returns:
+        `dict`: Cleaned names by raw name, empty if nothing is cached
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r") as f:
+        memo = json.load(f)
+    logger.info("Loaded %i cleaned ingredient names", len(memo))
+
+    return memo
+
+
+def save_memo(memo, path, cached):
+    """Save cleaned ingredient names if any were added since loading
+
+    Names cached by other runs since loading are merged in. The file is
+    not locked, so runs saving at the same moment can still drop each
+    other's new names, which are then cleaned again by a later run.
+
+    Args:
+        memo (`dict`): Cleaned names by raw name
+        path (str): Path to the JSON file
+        cached (int): Number of names loaded from the file
+    """
+    if len(memo) <= cached:
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            memo = {**json.load(f), **memo}
+    write_json(memo, path)
+    logger.info("Cached %i new ingredient names", len(memo) - cached)
+
+
 def clean(
     data_dictionary,
     patterns,
@@ -97,6 +296,9 @@ def clean(
     ingredients_attr="ingredients",
     cuisine_col="cuisine",
     ingredient_col="ingredient",
+    cache_dir=None,
+    engine="python",
+    memo=None,
 ):
     """Main cleaning function that takes a dictionary and formats all
     strings (ingredients) to be formatted so that all patterns listed
@@ -104,7 +306,8 @@ def clean(
     any words specified.
 
     Args:
-        data_dictionary (dict)): Input data to be cleaned
+        data_dictionary (iterable): Input data to be cleaned, e.g. a list
+        of recipes or the lazy records of `iter_json`
         patterns (array-like): List of regular expression patterns to
         remove from ingredient names
         remove_words (array-like): Any words to be removed (up until and
@@ -117,10 +320,23 @@ def clean(
         dataframe. Defaults to "cuisine".
         ingredient_col (str, optional): Name of ingredient column on the
         output dataframe. Defaults to "ingredient".
+        cache_dir (str, optional): Directory to keep cleaned ingredient
+        names in across runs. Names cleaned by an earlier run with the same
+        patterns and remove words are looked up instead of cleaned again.
+        Defaults to None, no cache.
+        engine (str, optional): "python" to clean one record at a time,
+        "pandas" to clean all ingredient names with vectorized string
+        methods. Both give the same output. Defaults to "python".
+        memo (`dict`, optional): Cleaned names by raw name to start from
+        instead of the cache file, updated in place with the names cleaned
+        by this run. Defaults to None.
 
     Returns:
-        `pandas.DataFrame`: Recipe ingredients dataframe
+        `pandas.DataFrame`: Recipe ingredients dataframe, categorical
+        columns with sorted categories
     """
+    if cache_dir is not None:
+        memo_path = memo_file(cache_dir, patterns, remove_words)
 
     # Add any additional patterns to remove from ingr name
     rp = regex_patterns(remove_words)
@@ -129,24 +345,297 @@ def clean(
         patterns = patterns + rp
     else:
         logger.warning("One or more words have wrong type")
+    patterns = compile_patterns(patterns)
+
+    # Ingredient names repeat across recipes, clean each one once
+    if memo is None:
+        memo = load_memo(memo_path) if cache_dir is not None else {}
+    cached = len(memo)
+
+    logger.info("Reformatting records with the %s engine", engine)
+    if engine == "pandas":
+        ingredients, cuisines = _clean_pandas(
+            data_dictionary, patterns, memo, cuisine_attr, ingredients_attr
+        )
+    else:
+        ingredients, cuisines = _clean_python(
+            data_dictionary, patterns, memo, cuisine_attr, ingredients_attr
+        )
+
+    if cache_dir is not None:
+        save_memo(memo, memo_path, cached)
+
+    # Convert to dataframe
+    df = pd.DataFrame({ingredient_col: ingredients, cuisine_col: cuisines})
+    return df
+
+
+def _clean_python(
+    data_dictionary, patterns, memo, cuisine_attr, ingredients_attr
+):
+    """Clean records one at a time with `clean_ingr`
+
+    Args:
+        data_dictionary (iterable): Input data to be cleaned
+        patterns (`list`): Compiled regex patterns to remove
+        memo (`dict`): Cleaned strings by raw string, updated in place
+        cuisine_attr (str): Name of cuisine attribute in JSON
+        ingredients_attr (str): Name of ingredients attribute in JSON
 
-    recipe_ings = []
+    Returns:
+        `pandas.Categorical`, `pandas.Categorical`: Ingredient and cuisine
+        columns
+    """
+    # Columns are buffered as integer codes into the categories,
+    # numbered in order of appearance
+    ingredient_categories = {}
+    cuisine_categories = {}
+    ingredient_codes = array.array("l")
+    cuisine_codes = array.array("l")
 
-    logger.info("Reformatting %i records", len(data_dictionary))
+    count = 0
     try:
         for recipe in data_dictionary:
+            count += 1
             cuisine = recipe[cuisine_attr]
             ingredients = recipe[ingredients_attr]
 
-            recipe_ings = recipe_ings + [
-                (x, cuisine) for x in clean_ingr(ingredients, patterns)
-            ]
+            cleaned = clean_ingr(ingredients, patterns, memo=memo)
+            if not cleaned:
+                continue
+
+            if cuisine is None:
+                code = -1
+            else:
+                code = cuisine_categories.setdefault(
+                    cuisine, len(cuisine_categories)
+                )
+            for x in cleaned:
+                ingredient_codes.append(
+                    ingredient_categories.setdefault(
+                        x, len(ingredient_categories)
+                    )
+                )
+                cuisine_codes.append(code)
     except KeyError:
         logger.error(
             "Attributes %s or %s not found in input dictionary",
             cuisine_attr,
             ingredients_attr,
         )
-    # Convert to dataframe
-    df = pd.DataFrame(data=recipe_ings, columns=[ingredient_col, cuisine_col])
-    return df
+    logger.info("Reformatted %i records", count)
+
+    return (
+        categorical(ingredient_codes, ingredient_categories),
+        categorical(cuisine_codes, cuisine_categories),
+    )
+
+
+def _clean_pandas(
+    data_dictionary, patterns, memo, cuisine_attr, ingredients_attr
+):
+    """Clean records with vectorized pandas string methods. Ingredients of
+    all recipes are collected into one long column, and every pattern is
+    replaced over its distinct values at once before mapping them back.
+
+    Args:
+        data_dictionary (iterable): Input data to be cleaned
+        patterns (`list`): Compiled regex patterns to remove
+        memo (`dict`): Cleaned strings by raw string, updated in place
+        cuisine_attr (str): Name of cuisine attribute in JSON
+        ingredients_attr (str): Name of ingredients attribute in JSON
+
+    Returns:
+        `pandas.Categorical`, `pandas.Categorical`: Ingredient and cuisine
+        columns
+    """
+    raw = []
+    cuisines = []
+    lengths = array.array("l")
+
+    count = 0
+    try:
+        for recipe in data_dictionary:
+            count += 1
+            cuisine = recipe[cuisine_attr]
+            ingredients = recipe[ingredients_attr]
+
+            raw.extend(ingredients)
+            cuisines.append(cuisine)
+            lengths.append(len(ingredients))
+    except KeyError:
+        logger.error(
+            "Attributes %s or %s not found in input dictionary",
+            cuisine_attr,
+            ingredients_attr,
+        )
+    logger.info("Reformatted %i records", count)
+
+    raw_codes, uniques = pd.factorize(pd.Series(raw, dtype=object))
+    if (raw_codes < 0).any() or not all(isinstance(x, str) for x in uniques):
+        raise TypeError("String type expected in record")
+
+    # Only clean distinct names that are not known yet
+    new = uniques[[x not in memo for x in uniques]]
+    fixed = pd.Series(new, dtype=object)
+    for pattern in patterns:
+        fixed = fixed.str.replace(pattern, "", regex=True)
+    memo.update(zip(new, fixed))
+
+    codes, categories = pd.factorize(
+        pd.Series([memo[x] for x in uniques], dtype=object), sort=True
+    )
+    ingredients = pd.Categorical.from_codes(codes[raw_codes], categories)
+
+    # Recipes without ingredients add no cuisine category
+    lengths = np.frombuffer(lengths, dtype=np.dtype(lengths.typecode))
+    cuisines = pd.Series(cuisines, dtype=object)[lengths > 0]
+    codes, categories = pd.factorize(cuisines, sort=True)
+    cuisines = pd.Categorical.from_codes(
+        np.repeat(codes, lengths[lengths > 0]), categories
+    )
+
+    return ingredients, cuisines
+
+
+def concat_clean(frames):
+    """Concatenate cleaned dataframes in order, merging the categories of
+    their columns
+
+    Args:
+        frames (`list`): Dataframes returned by `clean`
+
+    Returns:
+        `pandas.DataFrame`: Recipe ingredients dataframe, categorical
+        columns with sorted categories
+    """
+    return pd.DataFrame(
+        {
+            col: union_categoricals(
+                [df[col].values for df in frames], sort_categories=True
+            )
+            for col in frames[0].columns
+        }
+    )
+
+
+def _init_clean_worker(state):
+    """Store the shared records and cleaning arguments in a worker process
+
+    Args:
+        state (`dict`): Records and keyword arguments to `clean`
+    """
+    _clean_state.update(state)
+
+
+def _clean_shard(bounds):
+    """Clean a contiguous range of the shared records
+
+    Args:
+        bounds (`tuple`): Start and stop index of the range
+
+    Returns:
+        `pandas.DataFrame`, `dict`, int: Recipe ingredients dataframe of
+        the range, the names cleaned for the first time in this worker, and
+        the index of the first record missing attributes, None if there
+        is none
+    """
+    start, stop = bounds
+    records = _clean_state["records"][start:stop]
+    kwargs = _clean_state["kwargs"]
+    # clean stops at this record, the shard reports it to stop the run too
+    failed = next(
+        (
+            start + i
+            for i, recipe in enumerate(records)
+            if kwargs["cuisine_attr"] not in recipe
+            or kwargs["ingredients_attr"] not in recipe
+        ),
+        None,
+    )
+
+    memo = _clean_state["memo"]
+    cached = len(memo)
+    df = clean(records, memo=memo, **kwargs)
+
+    return df, dict(itertools.islice(memo.items(), cached, None)), failed
+
+
+def clean_sharded(
+    data_dictionary,
+    workers,
+    shards_per_worker=4,
+    cuisine_attr="cuisine",
+    ingredients_attr="ingredients",
+    **kwargs,
+):
+    """Clean records across a pool of worker processes. Records are split
+    into contiguous shards that are cleaned independently and merged back
+    in order, so the output has the same rows as `clean`. Like `clean`,
+    the output ends before the first record with missing attributes: the
+    shard holding it is cut there and later shards are dropped. The cache
+    file of cleaned names is read once before the shards start, and
+    written once with the names of the kept shards after they finish.
+
+    Args:
+        data_dictionary (iterable): Input data to be cleaned, read into a
+        list if it is not one
+        workers (int): Number of worker processes
+        shards_per_worker (int, optional): Shards per worker process, more
+        even out the load across workers. Defaults to 4.
+        cuisine_attr (str, optional): Name of cuisine attribute in JSON.
+        Defaults to "cuisine".
+        ingredients_attr (str, optional): Name of ingredients attribute in
+        JSON. Defaults to "ingredients".
+        **kwargs: Other arguments to `clean`
+
+    Returns:
+        `pandas.DataFrame`: Recipe ingredients dataframe, categorical
+        columns with sorted categories
+    """
+    kwargs = {
+        "cuisine_attr": cuisine_attr,
+        "ingredients_attr": ingredients_attr,
+        **kwargs,
+    }
+    if workers <= 1:
+        return clean(data_dictionary, **kwargs)
+
+    data_dictionary = list(data_dictionary)
+    if len(data_dictionary) < 2:
+        return clean(data_dictionary, **kwargs)
+
+    n_shards = min(workers * shards_per_worker, len(data_dictionary))
+    bounds = np.linspace(0, len(data_dictionary), n_shards + 1).astype(int)
+
+    cache_dir = kwargs.pop("cache_dir", None)
+    if cache_dir is not None:
+        memo_path = memo_file(
+            cache_dir, kwargs["patterns"], kwargs["remove_words"]
+        )
+    memo = load_memo(memo_path) if cache_dir is not None else {}
+    cached = len(memo)
+
+    logger.info("Cleaning %i shards on %i workers", n_shards, workers)
+    state = {"records": data_dictionary, "kwargs": kwargs, "memo": memo}
+    with multiprocessing.Pool(
+        workers, initializer=_init_clean_worker, initargs=(state,)
+    ) as pool:
+        results = pool.map(_clean_shard, zip(bounds[:-1], bounds[1:]))
+
+    # A serial run stops at the first record missing attributes
+    failed = [i for i, (_, _, stop) in enumerate(results) if stop is not None]
+    if failed:
+        logger.error(
+            "Record %i is missing attributes, dropping %i later shards",
+            results[failed[0]][2],
+            len(results) - failed[0] - 1,
+        )
+        results = results[: failed[0] + 1]
+
+    for _, new, _ in results:
+        memo.update(new)
+    if cache_dir is not None:
+        save_memo(memo, memo_path, cached)
+
+    return concat_clean([df for df, _, _ in results])
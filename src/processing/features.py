@@ -1,5 +1,7 @@
 import logging
 import numpy as np
+import pandas as pd
+from scipy import sparse
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +25,90 @@ def ingr_sum(df):
         return np.nan
 
 
-def generate_train_df(df, drop_rows=None, min_prevalence=100, sum_column=None):
+def factorize_sorted(values):
+    """Encode values as integer codes into their sorted distinct values,
+    the order groupby sorts groups in. For categorical values, only
+    observed categories are kept, sorted by value.
+
+    Args:
+        values (`pandas.Series`): Values to encode
+
+    Returns:
+        `numpy.ndarray`, `numpy.ndarray`: Codes of every value, -1 for
+        missing values, and the sorted distinct values
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques)
+
+    order = np.argsort(uniques, kind="mergesort")
+    remap = np.empty(len(order) + 1, dtype=np.intp)
+    remap[order] = np.arange(len(order))
+    remap[-1] = -1
+
+    return remap[codes], uniques[order]
+
+
+def count_table(
+    counts, ingredients, cuisines, drop_rows, min_prevalence, sum_column
+):
+    """Turn an ingredient x cuisine count matrix into the training
+    dataframe of `generate_train_df`
+
+    Args:
+        counts (`numpy.ndarray`): Integer counts, one row per ingredient
+        and one column per cuisine
+        ingredients (`numpy.ndarray`): Sorted ingredient names
+        cuisines (`numpy.ndarray`): Sorted cuisine names
+        drop_rows (`list`): Ingredients to not include in training set
+        min_prevalence (int): Minimum row sum of an ingredient
+        sum_column (str): Name given to row sum column
+
+    Returns:
+        `pandas.DataFrame`: Reshaped training dataframe
+    """
+    # Only names with counted pairs become rows and columns
+    keep_rows = counts.any(axis=1)
+    keep_cols = counts.any(axis=0)
+    counts = counts[keep_rows][:, keep_cols]
+    ingredients = ingredients[keep_rows]
+    cuisines = cuisines[keep_cols]
+
+    # Pairs that never occur are filled with 0 in a float table,
+    # a table without any stays integer
+    dtype = float if (counts == 0).any() else counts.dtype
+
+    # Drop ingredients listed in function from the training set
+    keep = np.ones(len(ingredients), dtype=bool)
+    if drop_rows:
+        keep &= ~pd.Index(ingredients).isin(drop_rows)
+        logger.info(
+            "Dropped %i rows containing: %s",
+            len(keep) - keep.sum(),
+            drop_rows,
+        )
+
+    # Row sum as computed by `ingr_sum`, skipping the first column,
+    # an empty sum is a float
+    sums = counts[:, 1:].sum(axis=1)
+    sum_dtype = dtype if counts.shape[1] > 1 else float
+
+    # Subset by a threshold total sum, drop ingredients
+    # that fall below it
+    keep &= sums >= min_prevalence
+
+    cuisinedf = pd.DataFrame(
+        counts[keep].astype(dtype),
+        index=pd.Index(ingredients[keep], name="ingredient"),
+        columns=pd.Index(cuisines, name="cuisine"),
+    )
+    cuisinedf[sum_column] = sums[keep].astype(sum_dtype)
+
+    return cuisinedf
+
+
+def generate_train_df(
+    df, drop_rows=None, min_prevalence=100, sum_column=None, sparse=False
+):
     """Reshapes cleaned dataframe to appropriate format for model training.
 
     The resulting dataframe has a row for each ingredient, a column
@@ -34,42 +119,173 @@ def generate_train_df(df, drop_rows=None, min_prevalence=100, sum_column=None):
         df (`pandas.DataFrame`): Cleaned dataframe. Each row represents a
         recipe ingredient. Two columns: ingredient name, cuisine label
         drop_rows (`list`, optional): Any particular ingredients to not
-        include in training set. Defaults to None.
+        include in training set, ignored if not present. Defaults to None.
         min_prevalence (int, optional): If row sum of an ingredient
         falls under this threshold, remove row from training column.
         Defaults to 100.
         sum_column (str, optional): Name given to row sum column.
         Defaults to None.
+        sparse (bool, optional): If True, count directly into a sparse
+        matrix and return a dataframe of sparse columns, with the same
+        values. Defaults to False.
 
     Returns:
         `pandas.DataFrame`: Return reshaped training dataframe
     """
+    if sparse:
+        return sparse_train_df(df, drop_rows, min_prevalence, sum_column)
+
+    ingr_codes, ingredients = factorize_sorted(df["ingredient"])
+    cuisine_codes, cuisines = factorize_sorted(df["cuisine"])
+
+    # Count every (ingredient, cuisine) pair at once, missing names are
+    # left out as they are by groupby
+    valid = (ingr_codes >= 0) & (cuisine_codes >= 0)
+    counts = np.bincount(
+        ingr_codes[valid] * len(cuisines) + cuisine_codes[valid],
+        minlength=len(ingredients) * len(cuisines),
+    ).reshape(len(ingredients), len(cuisines))
 
-    # Group by ingredient and count each cuisine
-    cuisine_series = df.groupby("ingredient").cuisine.value_counts()
+    return count_table(
+        counts, ingredients, cuisines, drop_rows, min_prevalence, sum_column
+    )
 
-    # Pivot the dataframe, if cuisine doesn't include ingredient,
-    # fill with 0
-    cuisinedf = cuisine_series.unstack().fillna(0)
+
+def chunked_train_df(
+    chunks, drop_rows=None, min_prevalence=100, sum_column=None, sparse=False
+):
+    """Out-of-core version of `generate_train_df`. Counts of every
+    (ingredient, cuisine) pair are accumulated one chunk of the cleaned
+    data at a time, so memory is bounded by the chunk size and the size of
+    the count table rather than the length of the cleaned data. Filtering
+    happens once all chunks are counted, and the output is the same as
+    `generate_train_df` on the whole data.
+
+    Args:
+        chunks (iterable): Cleaned dataframes, e.g. from `pandas.read_csv`
+        with a `chunksize`
+        drop_rows (`list`, optional): Any particular ingredients to not
+        include in training set, ignored if not present. Defaults to None.
+        min_prevalence (int, optional): If row sum of an ingredient
+        falls under this threshold, remove row from training column.
+        Defaults to 100.
+        sum_column (str, optional): Name given to row sum column.
+        Defaults to None.
+        sparse (bool, optional): If True, return a dataframe of sparse
+        columns, with the same values. Defaults to False.
+
+    Returns:
+        `pandas.DataFrame`: Return reshaped training dataframe
+    """
+    # Names are numbered in order of appearance across chunks
+    ingr_ids = {}
+    cuisine_ids = {}
+    counts = np.zeros((0, 0), dtype=np.int64)
+
+    for number, chunk in enumerate(chunks):
+        ingr_codes, ingredients = pd.factorize(chunk["ingredient"])
+        cuisine_codes, cuisines = pd.factorize(chunk["cuisine"])
+
+        valid = (ingr_codes >= 0) & (cuisine_codes >= 0)
+        chunk_counts = np.bincount(
+            ingr_codes[valid] * len(cuisines) + cuisine_codes[valid],
+            minlength=len(ingredients) * len(cuisines),
+        ).reshape(len(ingredients), len(cuisines))
+
+        rows = [ingr_ids.setdefault(x, len(ingr_ids)) for x in ingredients]
+        cols = [cuisine_ids.setdefault(x, len(cuisine_ids)) for x in cuisines]
+
+        # Grow the table geometrically to fit names seen for the first time
+        n_rows, n_cols = len(ingr_ids), len(cuisine_ids)
+        if n_rows > counts.shape[0] or n_cols > counts.shape[1]:
+            grown = np.zeros(
+                (max(n_rows, 2 * counts.shape[0]), n_cols), dtype=np.int64
+            )
+            grown[: counts.shape[0], : counts.shape[1]] = counts
+            counts = grown
+
+        counts[np.ix_(rows, cols)] += chunk_counts
+        logger.debug("Counted chunk %i of %i rows", number, len(chunk))
+
+    ingredients = np.array(list(ingr_ids), dtype=object)
+    cuisines = np.array(list(cuisine_ids), dtype=object)
+    counts = counts[: len(ingredients), : len(cuisines)]
+
+    # Sort names as `generate_train_df` does
+    ingr_order = np.argsort(ingredients, kind="mergesort")
+    cuisine_order = np.argsort(cuisines, kind="mergesort")
+    cuisinedf = count_table(
+        counts[ingr_order][:, cuisine_order],
+        ingredients[ingr_order],
+        cuisines[cuisine_order],
+        drop_rows,
+        min_prevalence,
+        sum_column,
+    )
+
+    if sparse:
+        return cuisinedf.astype(pd.SparseDtype(float, 0))
+
+    return cuisinedf
+
+
+def sparse_train_df(df, drop_rows=None, min_prevalence=100, sum_column=None):
+    """Sparse version of `generate_train_df`. Counts are accumulated in a
+    sparse matrix from the integer codes of ingredients and cuisines, so
+    memory scales with the number of distinct (ingredient, cuisine) pairs
+    rather than ingredients x cuisines.
+
+    Args:
+        df (`pandas.DataFrame`): Cleaned dataframe. Each row represents a
+        recipe ingredient. Two columns: ingredient name, cuisine label
+        drop_rows (`list`, optional): Any particular ingredients to not
+        include in training set, ignored if not present. Defaults to None.
+        min_prevalence (int, optional): If row sum of an ingredient
+        falls under this threshold, remove row from training column.
+        Defaults to 100.
+        sum_column (str, optional): Name given to row sum column.
+        Defaults to None.
+
+    Returns:
+        `pandas.DataFrame`: Reshaped training dataframe, sparse columns
+    """
+    ingr_codes, ingredients = factorize_sorted(df["ingredient"])
+    cuisine_codes, cuisines = factorize_sorted(df["cuisine"])
+
+    # Missing names are left out, as they are by groupby
+    valid = (ingr_codes >= 0) & (cuisine_codes >= 0)
+    counts = sparse.coo_matrix(
+        (
+            np.ones(valid.sum()),
+            (ingr_codes[valid], cuisine_codes[valid]),
+        ),
+        shape=(len(ingredients), len(cuisines)),
+    ).tocsr()
+
+    keep_rows = np.bincount(ingr_codes[valid], minlength=len(ingredients)) > 0
+    keep_cols = np.bincount(cuisine_codes[valid], minlength=len(cuisines)) > 0
 
     # Drop ingredients listed in function from the training set
     if drop_rows:
-        prev_length = len(cuisinedf)
-        cuisinedf = cuisinedf.drop(drop_rows, axis=0)
+        dropped = keep_rows & pd.Index(ingredients).isin(drop_rows)
+        keep_rows &= ~dropped
         logger.info(
-            "Dropped %i rows containing: %s",
-            prev_length - len(cuisinedf),
-            drop_rows,
+            "Dropped %i rows containing: %s", dropped.sum(), drop_rows
         )
 
-    # Set sum column
-    try:
-        cuisinedf[sum_column] = ingr_sum(cuisinedf)
-    except KeyError:
-        logger.error("Sum column not set")
+    counts = counts[keep_rows][:, keep_cols]
+    ingredients = pd.Index(ingredients[keep_rows], name="ingredient")
+    cuisines = pd.Index(cuisines[keep_cols], name="cuisine")
+
+    # Row sum as computed by `ingr_sum`, skipping the first column
+    sums = np.asarray(counts[:, 1:].sum(axis=1)).ravel()
 
     # Subset by a threshold total sum, drop ingredients
     # that fall below it
-    cuisinedf = cuisinedf[cuisinedf.ingr_sum >= min_prevalence]
+    above = sums >= min_prevalence
+    cuisinedf = pd.DataFrame.sparse.from_spmatrix(
+        counts[above], index=ingredients[above], columns=cuisines
+    )
+    cuisinedf[sum_column] = pd.arrays.SparseArray(sums[above], fill_value=0)
 
     return cuisinedf
@@ -1,16 +1,28 @@
+import hashlib
 import json
 import logging
+import multiprocessing
 
-from sklearn.model_selection import train_test_split
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold, train_test_split
+
+from src.processing.clean import clean, iter_json
+from src.processing.features import generate_train_df
+from src.recsys.model import RecipeModel
 
 logger = logging.getLogger(__name__)
 
+# Corpus shared by the cross-validation worker processes, set once per
+# worker by _init_fold_worker
+_fold_state = {}
+
 
 def generate_splits(filepath, random_state, train_size=0.8):
     """Generate a train and test split from raw data file
 
     Args:
-        filepath (`str`): Path to the JSON file
+        filepath (`str`): Path to the JSON or newline-delimited JSON file
         train_size (float, optional): Relative size of train set.
         Defaults to 0.8.
 
@@ -18,9 +30,8 @@ def generate_splits(filepath, random_state, train_size=0.8):
         JSON, JSON: Train and test sets as a JSON, or a Python `dict` object
     """
     try:
-        with open(filepath, "r") as f:
-            obj = json.load(f)
-            logger.debug("Opened file at %s", filepath)
+        obj = list(iter_json(filepath))
+        logger.debug("Opened file at %s", filepath)
     except json.JSONDecodeError:
         logger.error("invalid file supplied at %s, exiting eval", filepath)
         return None
@@ -39,32 +50,312 @@ def generate_splits(filepath, random_state, train_size=0.8):
     return train, test
 
 
-def get_accuracy(trained_model, test_list):
-    """Evaluate a trained model
+def split_fraction(key, random_state):
+    """Map a record key to a deterministic pseudo-random number in [0, 1)
 
     Args:
-        trained_model (any): Generic model object
+        key (any): Record key, e.g. the recipe id
+        random_state (int): Seed of the mapping
+
+    Returns:
+        float: Fraction derived from a hash of the seed and key
+    """
+    digest = hashlib.blake2b(
+        f"{random_state}:{key}".encode("utf-8"), digest_size=8
+    ).digest()
+
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def in_train(record, random_state, train_size=0.8, id_attr="id"):
+    """Check whether a record belongs to the train set of a seeded split
+
+    Args:
+        record (`dict`): Raw recipe
+        random_state (int): Seed of the split
+        train_size (float, optional): Relative size of train set.
+        Defaults to 0.8.
+        id_attr (str, optional): Name of the id attribute in JSON. Records
+        without one are keyed by their contents. Defaults to "id".
+
+    Returns:
+        bool: True if the record goes to the train set
+    """
+    try:
+        key = record[id_attr]
+    except KeyError:
+        key = json.dumps(record, sort_keys=True)
+
+    return split_fraction(key, random_state) < train_size
+
+
+def split_records(records, random_state, train_size=0.8, id_attr="id"):
+    """Split raw records in memory into the same train and test sets as
+    `stream_splits`
+
+    Args:
+        records (iterable): Raw recipes
+        random_state (int): Seed of the split
+        train_size (float, optional): Relative size of train set.
+        Defaults to 0.8.
+        id_attr (str, optional): Name of the id attribute in JSON. Records
+        without one are keyed by their contents. Defaults to "id".
+
+    Returns:
+        `list`, `list`: Train and test recipes
+    """
+    train, test = [], []
+    for record in records:
+        if in_train(record, random_state, train_size, id_attr):
+            train.append(record)
+        else:
+            test.append(record)
+    logger.info(
+        "Created train set of size %i and test set of size %i",
+        len(train),
+        len(test),
+    )
+
+    return train, test
+
+
+def stream_splits(
+    filepath, train_path, test_path, random_state, train_size=0.8, id_attr="id"
+):
+    """Split a raw data file into train and test files one record at a
+    time. Each record goes to the train set if a seeded hash of its id
+    falls below `train_size`, so the split is the same on every run and
+    the corpus is never held in memory.
+
+    Args:
+        filepath (`str`): Path to the JSON or newline-delimited JSON file
+        train_path (`str`): Path to write the train set to
+        test_path (`str`): Path to write the test set to
+        random_state (int): Seed of the split
+        train_size (float, optional): Relative size of train set.
+        Defaults to 0.8.
+        id_attr (str, optional): Name of the id attribute in JSON. Records
+        without one are keyed by their contents. Defaults to "id".
+
+    Returns:
+        int, int: Sizes of the train and test sets
+    """
+    sizes = {train_path: 0, test_path: 0}
+
+    with open(train_path, "w") as train, open(test_path, "w") as test:
+        files = {train_path: train, test_path: test}
+        for f in files.values():
+            f.write("[")
+
+        for record in iter_json(filepath):
+            if in_train(record, random_state, train_size, id_attr):
+                path = train_path
+            else:
+                path = test_path
+
+            if sizes[path]:
+                files[path].write(", ")
+            json.dump(record, files[path])
+            sizes[path] += 1
+
+        for f in files.values():
+            f.write("]")
+
+    logger.info(
+        "Created train set of size %i and \
+        test set of size %i, train size %f",
+        sizes[train_path],
+        sizes[test_path],
+        train_size,
+    )
+
+    return sizes[train_path], sizes[test_path]
+
+
+def evaluate_model(trained_model, test_list):
+    """Evaluate a trained model on a whole test set at once. All recipes
+    are scored in a single batch, and every metric comes from the same
+    set of predictions.
+
+    Args:
+        trained_model (any): Generic model object with `predict_batch`
         test_list (`list`): Test set as a list
 
     Returns:
-        float: Correct classification rate
+        `dict`: Top-1 and top-k correct classification rates ("top_1",
+        "top_k", k being the number of guesses of the model) and the
+        top-k rate of every cuisine label ("per_cuisine")
     """
     try:
-        cleantest = [(i["ingredients"], i["cuisine"]) for i in test_list]
+        recipes = [i["ingredients"] for i in test_list]
+        labels = np.array([i["cuisine"] for i in test_list], dtype=object)
     except KeyError:
         logger.error("Test set contains corrupted values")
         return None
 
-    def evaluator(x):
-        """Compare label to prediction"""
-        return x[1] in list(trained_model.predict(x[0]).index)
+    if len(labels) == 0:
+        logger.error("Supplied empty training set, exiting")
+        return None
+
+    guesses = np.array(trained_model.predict_batch(recipes), dtype=object)
+    guesses = guesses.reshape(len(labels), -1)
+    hits = guesses == labels[:, np.newaxis]
+
+    top_k = hits.any(axis=1)
+    per_cuisine = pd.Series(top_k).groupby(labels).mean()
+
+    return {
+        "top_1": hits[:, :1].any(axis=1).mean(),
+        "top_k": top_k.mean(),
+        "per_cuisine": per_cuisine.to_dict(),
+    }
 
+
+def write_metrics(metrics, path):
+    """Write the metrics of `evaluate_model` to a text file
+
+    Args:
+        metrics (`dict`): Top-1, top-k and per-cuisine correct
+        classification rates
+        path (`str`): Path to the results file
+    """
+    with open(path, "w") as f:
+        f.write(f"Accuracy: {str(metrics['top_k'])}\n")
+        f.write(f"Top-1 accuracy: {str(metrics['top_1'])}\n")
+        for cuisine, acc in metrics["per_cuisine"].items():
+            f.write(f"{cuisine}: {str(acc)}\n")
+    logger.info("Saved results file at %s", path)
+
+
+def get_accuracy(trained_model, test_list):
+    """Evaluate a trained model
+
+    Args:
+        trained_model (any): Generic model object
+        test_list (`list`): Test set as a list
+
+    Returns:
+        float: Correct classification rate
+    """
     # Return percentage of sets of predictions that matched
     # the label within set
-    try:
-        acc = sum(list(map(evaluator, cleantest))) / len(cleantest)
-    except ZeroDivisionError:
-        logger.error("Supplied empty training set, exiting")
+    metrics = evaluate_model(trained_model, test_list)
+    if metrics is None:
         return None
 
-    return acc
+    return metrics["top_k"]
+
+
+def _init_fold_worker(state):
+    """Store the shared cross-validation corpus in a worker process
+
+    Args:
+        state (`dict`): Cleaned corpus, recipe ids and configurations
+    """
+    _fold_state.update(state)
+
+
+def _run_fold(fold):
+    """Featurize, train and evaluate a single cross-validation fold on the
+    shared corpus
+
+    Args:
+        fold (`tuple`): Fold number, train recipe indices and test recipe
+        indices
+
+    Returns:
+        `dict`: Fold number and metrics from `evaluate_model`
+    """
+    number, train_idx, test_idx = fold
+    corpus = _fold_state["corpus"]
+    recipe_ids = _fold_state["recipe_ids"]
+    records = _fold_state["records"]
+
+    train = corpus[np.isin(recipe_ids, train_idx)].reset_index(drop=True)
+    train = generate_train_df(train, **_fold_state["features"])
+
+    model = RecipeModel(**_fold_state["initialize"])
+    model.train(train, **_fold_state["train"])
+
+    metrics = evaluate_model(model, [records[i] for i in test_idx])
+    logger.info("Finished fold %i", number)
+
+    return {"fold": number, **metrics}
+
+
+def cross_validate(
+    records,
+    clean_kwargs,
+    features_kwargs,
+    initialize_kwargs,
+    train_kwargs,
+    n_splits=5,
+    random_state=None,
+    workers=None,
+):
+    """Run k-fold cross-validation of the model pipeline. The corpus is
+    cleaned once up front and shared with a pool of worker processes,
+    each of which featurizes, trains and evaluates one fold at a time.
+
+    Args:
+        records (`list`): Raw recipes, as read from the JSON file
+        clean_kwargs (`dict`): Arguments to `clean`
+        features_kwargs (`dict`): Arguments to `generate_train_df`
+        initialize_kwargs (`dict`): Arguments to `RecipeModel`
+        train_kwargs (`dict`): Arguments to `RecipeModel.train`
+        n_splits (int, optional): Number of folds. Defaults to 5.
+        random_state (int, optional): Seed of the fold shuffle.
+        Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to
+        None, one per CPU core.
+
+    Returns:
+        `pandas.DataFrame`: Top-1, top-k and per-cuisine hit rates, one
+        row per fold followed by the "mean" and "std" across folds
+    """
+    corpus = clean(records, **clean_kwargs)
+
+    # clean emits one row per ingredient, in recipe order
+    ingredients_attr = clean_kwargs.get("ingredients_attr", "ingredients")
+    lengths = [len(recipe.get(ingredients_attr, [])) for recipe in records]
+    if len(corpus) != sum(lengths):
+        logger.error("Could not clean every record, exiting cross-validation")
+        return None
+    recipe_ids = np.repeat(np.arange(len(records)), lengths)
+
+    folds = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    folds = [
+        (number, train_idx, test_idx)
+        for number, (train_idx, test_idx) in enumerate(folds.split(records))
+    ]
+
+    state = {
+        "corpus": corpus,
+        "recipe_ids": recipe_ids,
+        "records": records,
+        "features": features_kwargs,
+        "initialize": initialize_kwargs,
+        "train": train_kwargs,
+    }
+
+    workers = min(workers or multiprocessing.cpu_count(), n_splits)
+    logger.info("Running %i folds on %i workers", n_splits, workers)
+    with multiprocessing.Pool(
+        workers, initializer=_init_fold_worker, initargs=(state,)
+    ) as pool:
+        results = pool.map(_run_fold, folds)
+
+    report = pd.DataFrame(
+        [
+            {
+                "top_1": result["top_1"],
+                "top_k": result["top_k"],
+                **result["per_cuisine"],
+            }
+            for result in results
+        ],
+        index=[result["fold"] for result in results],
+    )
+    summary = report.agg(["mean", "std"])
+
+    return pd.concat([report, summary]).rename_axis("fold")
@@ -1,7 +1,14 @@
+import copy
+import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +71,20 @@ def normalize(col, scale=1, exclude=None):
     return col
 
 
+def is_sparse(df):
+    """Check whether every column of a dataframe is sparse
+
+    Args:
+        df (`pandas.DataFrame`): Dataframe to check
+
+    Returns:
+        bool: True if all columns have a sparse dtype
+    """
+    return len(df.columns) > 0 and all(
+        isinstance(dtype, pd.SparseDtype) for dtype in df.dtypes
+    )
+
+
 def softmax(raw):
     """Get relative percentages of a probability vector of
     mutually exclusive classes
@@ -82,6 +103,35 @@ def softmax(raw):
         logger.error("Invalid vector type, contains non-numeric")
 
 
+def descending_order(values):
+    """Order that sorts values descending, with the same tie order and
+    NaNs last as `pandas.Series.sort_values(ascending=False)`, which sorts
+    the reversed values with an unstable quicksort
+
+    Args:
+        values (`numpy.ndarray`): 1-D array of values
+
+    Returns:
+        `numpy.ndarray`: Positions of the values, largest first
+    """
+    is_nan = np.isnan(values)
+    positions = np.flatnonzero(~is_nan)[::-1]
+    order = positions[values[~is_nan][::-1].argsort(kind="quicksort")]
+
+    return np.concatenate([order[::-1], np.flatnonzero(is_nan)])
+
+
+# Arrays stored in a saved model artifact, cuisine-major where 2-D
+ARTIFACT_ARRAYS = [
+    "ingredients",
+    "sorted_ingredients",
+    "sorted_ids",
+    "pred_train",
+    "rec_train",
+    "rec_order",
+]
+
+
 class RecipeModel:
     """Combined predictive and recommender model for detecting cuisine
     type from lists of ingredients, as well as recommendations for
@@ -89,16 +139,32 @@ class RecipeModel:
 
     Class methods:
     - train()
+    - partial_fit()
+    - save() / load()
     - predict()
+    - predict_batch()
     - recommend()
     - predict_and_recommend()
 
     Training dataframes:
     - RecipeModel.rec_train (`pandas.DataFrame`)
     - RecipeModel.pred_train (`pandas.DataFrame`)
+
+    A model loaded memory-mapped scores directly against the arrays on
+    disk, and only builds the training dataframes when they are accessed.
+
+    If trained on a df of sparse columns, the model stays sparse: it keeps
+    the counts plus one scale and shift per cuisine and one mean per
+    ingredient, and computes scores from those. Memory and train time
+    then scale with the non-zero counts, and the training dataframes are
+    not available.
+
+    With a positive `cache_size`, results of predict_and_recommend() are
+    cached by sorted ingredient list, repeats included, and request mode.
+    The cache is cleared whenever the model is retrained or reloaded.
     """
 
-    def __init__(self, num_guesses=3, num_ingredients=5):
+    def __init__(self, num_guesses=3, num_ingredients=5, cache_size=0):
         # Initialize train sets for predictions and recommendations
         self.rec_train = None
         self.pred_train = None
@@ -108,11 +174,76 @@ class RecipeModel:
         self.num_ingredients = num_ingredients
 
         self.sum_column = None
-
-    def train(self, df, scale_const, sum_column):
+        self.train_time = None
+
+        # Sufficient statistics and train config kept for partial_fit
+        self.counts = None
+        self.scale_const = None
+        self.min_prevalence = 0
+        self._norm = None
+        self._rec = None
+
+        # Scoring structures compiled from the train sets
+        self._cuisines = None
+        self._pred_matrix = None
+        self._ingr_ids = None
+        self._rec_names = None
+        self._rec_values = None
+        self._rec_order = None
+
+        # Memory-mapped artifact arrays and metadata, if loaded with mmap
+        self._mmap = None
+        self._meta = None
+
+        # Sparse mode: counts and per-cuisine / per-ingredient terms of the
+        # train set, which is never materialized densely
+        self._counts_matrix = None
+        self._col_scale = None
+        self._col_shift = None
+        self._row_mean = None
+
+        # Bounded LRU cache of predict_and_recommend results, disabled if 0
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    @property
+    def pred_train(self):
+        """`pandas.DataFrame`: Train set for predictions"""
+        if self._pred_train is None and self._mmap is not None:
+            self._pred_train = self._mmap_frame("pred_train", "pred_columns")
+        return self._pred_train
+
+    @pred_train.setter
+    def pred_train(self, df):
+        self._pred_train = df
+
+    @property
+    def rec_train(self):
+        """`pandas.DataFrame`: Train set for recommendations"""
+        if self._rec_train is None and self._mmap is not None:
+            self._rec_train = self._mmap_frame("rec_train", "rec_columns")
+        return self._rec_train
+
+    @rec_train.setter
+    def rec_train(self, df):
+        self._rec_train = df
+
+    def train(
+        self, df, scale_const, sum_column, min_prevalence=0, timed=False
+    ):
         """Train RecipeModel. Computes and binds separate train sets for
         recommendations and predictions.
 
+        Both train sets are computed with whole-array operations that
+        reproduce `normalize` and `mean_center` applied per column and
+        per row. The count table is kept as the model's sufficient
+        statistics, so new recipes can be added with `partial_fit`.
+
         Args:
             df (`pandas.DataFrame`): DataFrame containing ingredient data. Df
             must be keyed by String repr of the ingredient, and must contain a
@@ -120,25 +251,293 @@ class RecipeModel:
             SCALE_CONST (`float`): Scale each cell by a constant if relative
             importance measures are too small
             SUM_COLUMN (String): Name of column representing sum of each row
+            min_prevalence (int, optional): Ingredients whose sum falls under
+            this threshold are kept in the counts but left out of the train
+            sets. Defaults to 0.
+            timed (bool, optional): If True, logs the time spent training.
+            Defaults to False.
         """
+        start = time.perf_counter()
         self.sum_column = sum_column
+        self.scale_const = scale_const
+        self.min_prevalence = min_prevalence
+        self.counts = df
+        self._mmap = None
+
+        if is_sparse(df):
+            self._fit_sparse()
+        else:
+            self._fit()
+
+        self.train_time = time.perf_counter() - start
+        if timed:
+            logger.info(
+                "Trained on %i ingredients in %.3f seconds",
+                len(df),
+                self.train_time,
+            )
+        logger.info("Training complete")
+
+    def partial_fit(self, new_counts):
+        """Add the counts of new recipes to the model without retraining
+        from scratch. The result is identical to `train` on
+        `generate_train_df` of the old and new recipes together: the
+        summed count table (`RecipeModel.counts`) keeps ingredients and
+        cuisines sorted, and its sum column is recomputed like
+        `generate_train_df` does, leaving out the first cuisine.
+
+        If no ingredient enters or leaves the train sets and no new
+        cuisine appears, only the cuisine columns with new counts are
+        recomputed. Otherwise the train sets are rederived from the
+        summed counts.
+
+        Args:
+            new_counts (`pandas.DataFrame`): Counts of the new recipes, in
+            the same layout as the df given to `train`, e.g. from
+            `generate_train_df` with `min_prevalence=0`. Ingredients and
+            cuisines not seen before are added.
+        """
+        if self.counts is None:
+            raise ValueError("Model needs to be trained before partial_fit")
+        if self._counts_matrix is not None:
+            raise ValueError("partial_fit is not supported for sparse models")
+
+        start = time.perf_counter()
+        old = self.counts
+
+        # Sorted ingredients and cuisines, as `generate_train_df` orders
+        # them on the concatenated recipes
+        cuisines = (
+            old.columns.drop(self.sum_column)
+            .union(new_counts.columns.drop(self.sum_column, errors="ignore"))
+            .rename(old.columns.name)
+        )
+        index = old.index.union(new_counts.index).rename(old.index.name)
+
+        counts = old.reindex(index=index, columns=cuisines, fill_value=0).add(
+            new_counts.reindex(index=index, columns=cuisines, fill_value=0)
+        )
+        # Sum recomputed like `ingr_sum`, skipping the first cuisine
+        counts[self.sum_column] = counts.iloc[:, 1:].sum(axis=1)
+        self.counts = counts
+
+        changed = new_counts.columns[
+            (new_counts != 0).any(axis=0).to_numpy()
+        ]
+        self._fit(changed=changed)
+        logger.info(
+            "Added counts for %i ingredients in %.3f seconds",
+            len(new_counts),
+            time.perf_counter() - start,
+        )
+
+    def _fit(self, changed=None):
+        """Derive the train sets from the retained counts.
+
+        Args:
+            changed (array-like, optional): Columns whose counts changed
+            since the last fit. If given, and the trained ingredients and
+            cuisines are unchanged, only these columns are recomputed.
+            Defaults to None.
+        """
+        df = self.counts
+        if self.min_prevalence:
+            df = df[df[self.sum_column] >= self.min_prevalence]
+
+        is_sum = np.asarray(df.columns == self.sum_column)
+        update = ~is_sum
+        if (
+            changed is not None
+            and df.columns.equals(self.pred_train.columns)
+            and df.index.equals(self.pred_train.index)
+        ):
+            update &= np.asarray(df.columns.isin(changed))
+            norm = self._norm.copy()
+            rec = self._rec.copy()
+            rec_order = np.stack(list(self._rec_order.values()))
+            logger.debug("Refitting %i columns", update.sum())
+        else:
+            norm = np.empty((len(df.columns), len(df)))
+            rec = np.empty((len(df.columns) - is_sum.sum(), len(df)))
+            rec_order = None
+
+        # Cuisine-major copy: every column reduction below runs over
+        # contiguous memory, in the same order as the per-column apply
+        cols = np.ascontiguousarray(
+            df.loc[:, update].to_numpy(dtype=np.float64).T
+        )
+
+        # Normalize every column except the sum column
+        avg = cols.mean(axis=1, keepdims=True)
+        total = cols.sum(axis=1, keepdims=True)
+        norm[update] = self.scale_const * (cols - avg) / total
+        norm[is_sum] = df.loc[:, is_sum].to_numpy(dtype=np.float64).T
+        self._norm = norm
+
+        # Mean center every row, skipping the last (sum) column
+        pred = np.ascontiguousarray(norm.T)
+        pred[:, :-1] -= pred[:, :-1].mean(axis=1, keepdims=True)
 
         # Assign train set
-        self.pred_train = df.apply(
-            normalize, exclude=[self.sum_column], scale=scale_const, axis=0
-        ).apply(mean_center, raw=True, axis=1)
+        self.pred_train = pd.DataFrame(
+            pred, index=df.index, columns=df.columns
+        )
         logger.info(
             "Trained for predictions, df length %i", len(self.pred_train)
         )
 
-        self.rec_train = df.drop(self.sum_column, axis=1).apply(
-            mean_center, raw=True, axis=0
+        # Mean center every cuisine column. Like `mean_center`, the last
+        # element of each column is left out of the mean and untouched.
+        cols[:, :-1] -= cols[:, :-1].mean(axis=1, keepdims=True)
+        rec_update = update[~is_sum]
+        rec[rec_update] = cols
+        self._rec = rec
+
+        self.rec_train = pd.DataFrame(
+            rec.T, index=df.index, columns=df.columns[~is_sum]
         )
         logger.info(
             "Trained for recommendations, df length %i", len(self.rec_train)
         )
 
-        logger.info("Training complete")
+        if rec_order is not None:
+            for i, col in zip(np.flatnonzero(rec_update), cols):
+                rec_order[i] = descending_order(col)
+        self._compile(rec_order=rec_order)
+
+    def _fit_sparse(self):
+        """Derive the sparse mode scoring terms from the retained counts.
+
+        A train set cell is `scale_c * count + shift_c - mean_i` for
+        cuisine c and ingredient i, the same quantity `_fit` computes
+        densely. Recommendations rank the non-zero counts of a cuisine,
+        as centering a column does not change its order.
+        """
+        df = self.counts
+        if self.min_prevalence:
+            df = df[np.asarray(df[self.sum_column] >= self.min_prevalence)]
+
+        cuisines = df.columns.drop(self.sum_column)
+        counts = df[cuisines].sparse.to_coo().tocsr().astype(np.float64)
+
+        # Normalize every column, then mean center every row
+        total = np.asarray(counts.sum(axis=0)).ravel()
+        self._col_scale = self.scale_const / total
+        self._col_shift = -self._col_scale * total / counts.shape[0]
+        self._row_mean = (
+            counts @ self._col_scale + self._col_shift.sum()
+        ) / len(cuisines)
+        self._counts_matrix = counts
+
+        self.pred_train = None
+        self.rec_train = None
+        self._pred_matrix = None
+        self._cuisines = cuisines
+        self._ingr_ids = {name: i for i, name in enumerate(df.index)}
+        self._rec_names = list(df.index)
+        self._rec_values = None
+
+        # Rank the non-zero counts of every cuisine, ties by row order.
+        # The last row is not centered by `_fit`, so it ranks as if its
+        # count was raised by the mean of the other rows.
+        by_cuisine = counts.tocsc()
+        last = counts.shape[0] - 1
+        last_counts = by_cuisine[last].toarray().ravel()
+        others_mean = (total - last_counts) / max(last, 1)
+        self._rec_order = {}
+        for j, cuisine in enumerate(cuisines):
+            start, end = by_cuisine.indptr[j], by_cuisine.indptr[j + 1]
+            rows = by_cuisine.indices[start:end]
+            values = by_cuisine.data[start:end]
+
+            rows, values = rows[rows != last], values[rows != last]
+            if last_counts[j] + others_mean[j] > 0:
+                rows = np.append(rows, last)
+                values = np.append(values, last_counts[j] + others_mean[j])
+
+            self._rec_order[cuisine] = rows[np.lexsort((rows, -values))]
+
+        self.clear_cache()
+        logger.info(
+            "Trained sparse model, %i ingredients and %i non-zero counts",
+            counts.shape[0],
+            counts.nnz,
+        )
+
+    def _compile(self, rec_order=None):
+        """Compile the trained dataframes into the lookup structures used
+        at scoring time: an ingredient to row id mapping, a dense
+        cuisine-major matrix of prediction weights (sum column excluded)
+        and the ingredient ranking of every cuisine for recommendations.
+
+        Args:
+            rec_order (`numpy.ndarray`, optional): Precomputed rankings,
+            one row per rec_train column. Computed if None.
+        """
+        self.clear_cache()
+        self._counts_matrix = None
+        pred = self.pred_train.drop(self.sum_column, axis=1)
+        self._cuisines = pred.columns
+
+        # Keep each cuisine contiguous so gathered rows are summed in the
+        # same order as the pandas reduction they replace
+        self._pred_matrix = np.ascontiguousarray(
+            pred.to_numpy(dtype=np.float64).T
+        )
+        self._ingr_ids = {name: i for i, name in enumerate(pred.index)}
+
+        # Rank every cuisine's ingredients once, in the order of a
+        # descending sort_values of the column
+        rec = self.rec_train.to_numpy(dtype=np.float64).T
+        if rec_order is None:
+            rec_order = [descending_order(col) for col in rec]
+        self._rec_names = list(self.rec_train.index)
+        self._rec_values = dict(zip(self.rec_train.columns, rec))
+        self._rec_order = dict(zip(self.rec_train.columns, rec_order))
+        logger.debug(
+            "Compiled scoring matrix of shape %s", self._pred_matrix.shape
+        )
+
+    def _lookup(self, ingredients):
+        """Map ingredient names to row ids of the trained df.
+
+        Args:
+            ingredients (array-like): List of ingredient names
+
+        Returns:
+            `list`: Row id of every ingredient, None if not found
+        """
+        if self._mmap is None:
+            return [self._ingr_ids.get(ingr) for ingr in ingredients]
+
+        # Memory-mapped models binary search the sorted vocabulary
+        # on disk rather than holding a dict in every process
+        names = np.array(list(ingredients), dtype=str)
+        vocab = self._mmap["sorted_ingredients"]
+        pos = np.searchsorted(vocab, names).clip(max=len(vocab) - 1)
+        found = vocab[pos] == names
+        ids = self._mmap["sorted_ids"][pos]
+
+        return [int(i) if f else None for i, f in zip(ids, found)]
+
+    def _score(self, ids):
+        """Sum the train set rows of the given ingredients
+
+        Args:
+            ids (`list`): Row ids of the selected ingredients
+
+        Returns:
+            `numpy.ndarray`: Score of every cuisine
+        """
+        if self._counts_matrix is None:
+            return self._pred_matrix[:, ids].sum(axis=1)
+
+        counts = np.asarray(self._counts_matrix[ids].sum(axis=0)).ravel()
+        return (
+            self._col_scale * counts
+            + len(ids) * self._col_shift
+            - self._row_mean[ids].sum()
+        )
 
     def predict(self, ingredients, verbose=False):
         """Return predictions from the trained dataframe.
@@ -152,57 +551,357 @@ class RecipeModel:
             indicating when ingredients are not found. Defaults to False.
 
         Returns:
-            [type]: [description]
+            `pandas.Series`: Top cuisine probabilities, sorted descending
         """
-        df = self.pred_train
+        ids = self._lookup(ingredients)
 
-        try:
-            # Get relevant rows
-            calc = df.loc[ingredients]
-        except KeyError:
+        if None in ids:
             # If one or more ingredients not found, subset the
             # ingredients to whatever is available in the train set
-            new_ingr = df.index.intersection(ingredients)
-
             if verbose:
                 logger.warning(
                     "One or more of the keys not found: %s",
-                    list(pd.Index(ingredients).difference(df.index)),
+                    sorted(
+                        {
+                            ingr
+                            for ingr, i in zip(ingredients, ids)
+                            if i is None
+                        }
+                    ),
                 )
-            calc = df.loc[new_ingr]
+            ids = sorted({i for i in ids if i is not None})
 
-        calc = calc.drop(self.sum_column, axis=1).sum(axis=0)
+        calc = pd.Series(self._score(ids), index=self._cuisines)
 
         ordered = softmax(calc).sort_values(ascending=False)
 
         return ordered[: self.num_guesses]
 
-    def recommend(self, cuisine, selected=None):
-        """Get predictions from a list of ingredients as a list.
-        Number of preds configured in init."""
-        df = self.rec_train
-
-        try:
-            if selected:
-                # attempt dropping selected rows
-                df = df.drop(labels=selected, axis=0)
-                logger.info(
-                    "Dropped a total of %i rows named: %s",
-                    len(self.rec_train) - len(df),
-                    selected,
+    def save(self, path):
+        """Save the trained model as a binary artifact holding the train
+        matrices, the ingredient vocabulary, the recommendation rankings
+        and the model config.
+
+        A path ending in `.npz` is written as a single archive. Any other
+        path is written as a directory of `.npy` arrays and a `meta.json`,
+        which can be loaded memory-mapped.
+
+        Args:
+            path (`str`): Output path
+        """
+        if self._counts_matrix is not None:
+            raise ValueError("Saving is not supported for sparse models")
+
+        ingredients = np.array(self.pred_train.index, dtype=str)
+        sorted_ids = np.argsort(ingredients, kind="mergesort")
+
+        meta = {
+            "num_guesses": self.num_guesses,
+            "num_ingredients": self.num_ingredients,
+            "sum_column": self.sum_column,
+            "index_name": self.pred_train.index.name,
+            "columns_name": self.pred_train.columns.name,
+            "pred_columns": list(self.pred_train.columns),
+            "rec_columns": list(self.rec_train.columns),
+        }
+        arrays = {
+            "ingredients": ingredients,
+            "sorted_ingredients": ingredients[sorted_ids],
+            "sorted_ids": sorted_ids,
+            "pred_train": np.ascontiguousarray(
+                self.pred_train.to_numpy(dtype=np.float64).T
+            ),
+            "rec_train": np.ascontiguousarray(
+                self.rec_train.to_numpy(dtype=np.float64).T
+            ),
+            "rec_order": np.stack(list(self._rec_order.values())),
+        }
+
+        if path.endswith(".npz"):
+            np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+        else:
+            os.makedirs(path, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(path, name + ".npy"), array)
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        logger.info("Saved trained model to %s", path)
+
+    @classmethod
+    def load(cls, path, mmap=False, cache_size=0):
+        """Load a model artifact written by `RecipeModel.save`. The loaded
+        model is ready for predictions and recommendations without
+        retraining.
+
+        Args:
+            path (`str`): Path to the `.npz` archive or artifact directory
+            mmap (bool, optional): If True, memory-map the arrays of an
+            artifact directory read-only and score against them directly,
+            so processes loading the same artifact share one copy of the
+            matrices. Defaults to False.
+            cache_size (int, optional): Size of the result cache of the
+            loaded model. Defaults to 0 (disabled).
+
+        Returns:
+            `RecipeModel`: Trained model
+        """
+        if os.path.isdir(path):
+            with open(os.path.join(path, "meta.json"), "r") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(
+                    os.path.join(path, name + ".npy"),
+                    mmap_mode="r" if mmap else None,
+                    allow_pickle=False,
                 )
-        except KeyError:
+                for name in ARTIFACT_ARRAYS
+            }
+        else:
+            if mmap:
+                logger.warning(
+                    "Cannot memory-map archive %s, loading into memory", path
+                )
+                mmap = False
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                arrays = {name: data[name] for name in ARTIFACT_ARRAYS}
+
+        model = cls(
+            num_guesses=meta["num_guesses"],
+            num_ingredients=meta["num_ingredients"],
+            cache_size=cache_size,
+        )
+        model.sum_column = meta["sum_column"]
+        model._meta = meta
+        model._mmap = arrays
+
+        if mmap:
+            model._compile_mmap()
+        else:
+            model.pred_train = model._mmap_frame("pred_train", "pred_columns")
+            model.rec_train = model._mmap_frame("rec_train", "rec_columns")
+            model._mmap = None
+            model._compile(rec_order=arrays["rec_order"])
+
+        logger.info(
+            "Loaded trained model from %s, %i ingredients",
+            path,
+            len(arrays["ingredients"]),
+        )
+        return model
+
+    def _mmap_frame(self, name, columns):
+        """Wrap a cuisine-major artifact array in a dataframe, without
+        copying the values.
+
+        Args:
+            name (String): Name of the artifact array
+            columns (String): Name of the metadata entry listing columns
+
+        Returns:
+            `pandas.DataFrame`: Train set keyed by ingredient
+        """
+        return pd.DataFrame(
+            self._mmap[name].T,
+            index=pd.Index(
+                self._mmap["ingredients"].tolist(),
+                name=self._meta["index_name"],
+            ),
+            columns=pd.Index(
+                self._meta[columns], name=self._meta["columns_name"]
+            ),
+            copy=False,
+        )
+
+    def _compile_mmap(self):
+        """Point the scoring structures at memory-mapped artifact arrays.
+        Unlike `_compile`, nothing proportional to the vocabulary size is
+        copied into the process.
+        """
+        self.clear_cache()
+        self._counts_matrix = None
+        columns = self._meta["pred_columns"]
+        is_sum = np.array([col == self.sum_column for col in columns])
+        self._cuisines = pd.Index(
+            [col for col in columns if col != self.sum_column],
+            name=self._meta["columns_name"],
+        )
+
+        pred = self._mmap["pred_train"]
+        if is_sum[-1] and not is_sum[:-1].any():
+            # Sum column is last, slicing it off keeps a view
+            self._pred_matrix = pred[:-1]
+        else:
+            self._pred_matrix = pred[~is_sum]
+
+        self._ingr_ids = None
+        self._rec_names = self._mmap["ingredients"]
+        self._rec_values = dict(
+            zip(self._meta["rec_columns"], self._mmap["rec_train"])
+        )
+        self._rec_order = dict(
+            zip(self._meta["rec_columns"], self._mmap["rec_order"])
+        )
+
+    def _indicator_matrix(self, recipes):
+        """Build a sparse recipe x ingredient indicator matrix. Like
+        `predict`, repeated ingredients count twice unless some ingredient
+        does not exist in the trained df, in which case the recipe is
+        subset to its unique known ingredients.
+
+        Args:
+            recipes (array-like): List of ingredient lists
+
+        Returns:
+            `scipy.sparse.csr_matrix`: One row per recipe, one column per
+            trained ingredient
+        """
+        indices = []
+        indptr = [0]
+        for ingredients in recipes:
+            ids = self._lookup(ingredients)
+            if None in ids:
+                ids = {i for i in ids if i is not None}
+            indices.extend(ids)
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr),
+            shape=(len(indptr) - 1, len(self._rec_names)),
+        )
+
+    def predict_batch(self, recipes):
+        """Return top cuisine predictions for many ingredient lists at once.
+        All recipes are scored with a single sparse matrix product against
+        the trained weights. Ingredients that do not exist in the trained
+        df are ignored.
+
+        Args:
+            recipes (array-like): List of ingredient lists
+
+        Returns:
+            `list`: For every recipe, list of the top cuisines,
+            most likely first. Number of guesses configured in init.
+        """
+        indicators = self._indicator_matrix(recipes)
+        if self._counts_matrix is None:
+            scores = indicators @ self._pred_matrix.T
+        else:
+            scores = (
+                (indicators @ self._counts_matrix).toarray() * self._col_scale
+                + np.asarray(indicators.sum(axis=1)) * self._col_shift
+                - (indicators @ self._row_mean)[:, np.newaxis]
+            )
+        logger.debug("Scored a batch of %i recipes", scores.shape[0])
+
+        # Rank the softmax row by row with the same tie order as the
+        # descending sort_values in predict
+        exp = np.e ** scores
+        probs = exp / np.sum(exp, axis=1, keepdims=True)
+        top = np.argsort(probs[:, ::-1], axis=1, kind="quicksort")
+        top = probs.shape[1] - 1 - top[:, ::-1][:, : self.num_guesses]
+        # The softmax is NaN where a score overflows, which sort_values
+        # ranks last and argsort first
+        for row in np.flatnonzero(np.isnan(probs).any(axis=1)):
+            top[row] = descending_order(probs[row])[: self.num_guesses]
+
+        return [list(self._cuisines[row]) for row in top]
+
+    def _ranking(self, cuisine):
+        """Iterate over the row ids of a cuisine's ingredients, most
+        relevant first
+
+        Args:
+            cuisine (String): Cuisine to rank ingredients for
+
+        Yields:
+            int: Row id
+        """
+        order = self._rec_order[cuisine]
+        yield from order
+
+        if self._counts_matrix is not None:
+            # Sparse rankings hold non-zero counts only, the rest tie
+            ranked = set(order.tolist())
+            yield from (
+                i for i in range(len(self._rec_names)) if i not in ranked
+            )
+
+    def recommend(self, cuisine, selected=None):
+        """Get recommendations for a cuisine as a list, walking the
+        ranking precomputed at train time and skipping any selected
+        ingredients. Number of recs configured in init.
+
+        The result is the top of a descending sort of the cuisine column
+        with the selected rows dropped. Dropping rows can reorder tied
+        values in that sort, so if the walked ranking has ties among the
+        top recommendations, the remaining rows are sorted again.
+
+        Args:
+            cuisine (String): Cuisine to recommend ingredients for
+            selected (array-like, optional): Ingredients already selected,
+            excluded from the recommendations. Defaults to None.
+
+        Returns:
+            `list`: Recommended ingredients, most relevant first
+        """
+        ids = self._lookup(selected) if selected else []
+        if None in ids:
+            # Like dropping the rows by label, a single unknown ingredient
+            # leaves every selected ingredient in
             logger.error(
                 "One or more of selected ingredients \
             %s not found in database.",
                 selected,
             )
+            ids = []
+        skip = set(ids)
+
+        top = []
+        for i in self._ranking(cuisine):
+            if len(top) > self.num_ingredients:
+                break
+            if i not in skip:
+                top.append(i)
+
+        values = self._rec_values
+        if skip and values is not None:
+            ranked = values[cuisine][top]
+            if np.isnan(ranked).any() or (np.diff(ranked) >= 0).any():
+                keep = np.ones(len(values[cuisine]), dtype=bool)
+                keep[list(skip)] = False
+                rows = np.flatnonzero(keep)
+                top = rows[descending_order(values[cuisine][keep])]
+                logger.debug("Sorted %i rows to break ties", len(rows))
+
+        recommended = [
+            str(self._rec_names[i]) for i in top[: self.num_ingredients]
+        ]
+        logger.debug("Returning %i recommendations", len(recommended))
+
+        return recommended
+
+    def cache_info(self):
+        """Get statistics of the predict_and_recommend result cache
 
-        # Reorder list to return top n rows
-        ordered = df.loc[:, cuisine].sort_values(ascending=False)
-        logger.debug("Returning %i recommendations", self.num_ingredients)
-
-        return list((ordered[: self.num_ingredients]).index)
+        Returns:
+            `dict`: Hit, miss and eviction counts, current and max size
+        """
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "evictions": self.cache_evictions,
+                "size": len(self._cache),
+                "maxsize": self.cache_size,
+            }
+
+    def clear_cache(self):
+        """Remove all cached predict_and_recommend results. Called
+        automatically whenever the model is (re)trained or loaded."""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_generation += 1
 
     def predict_and_recommend(self, ingredients, request=False, verbose=False):
         """Predict cuisines from a list of ingredients, and provide recommended
@@ -222,6 +921,38 @@ class RecipeModel:
         Returns:
             `dict`: Dictionary of values
         """
+        if self.cache_size <= 0:
+            return self._predict_and_recommend(ingredients, request, verbose)
+
+        # Selections are cached regardless of the order items were added.
+        # Repeated ingredients count in predictions, so they stay in the
+        # key, and results are computed on the key so they only depend on
+        # it.
+        ingredients = sorted(ingredients)
+        key = (tuple(ingredients), request)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return copy.deepcopy(self._cache[key])
+            self.cache_misses += 1
+            generation = self._cache_generation
+
+        results = self._predict_and_recommend(ingredients, request, verbose)
+
+        with self._cache_lock:
+            # Skip results computed while the model was being retrained
+            if generation != self._cache_generation:
+                return results
+            self._cache[key] = copy.deepcopy(results)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.cache_evictions += 1
+
+        return results
+
+    def _predict_and_recommend(self, ingredients, request, verbose):
+        """Compute predict_and_recommend results, bypassing the cache"""
         logger.info(
             "Making %i predictions and %i recommendations",
             self.num_guesses,
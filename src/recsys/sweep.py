@@ -0,0 +1,201 @@
+import copy
+import functools
+import itertools
+import logging
+import multiprocessing
+import os
+
+import pandas as pd
+
+from src.cache import cache_path, config_hash, write_pickle
+from src.processing.clean import clean
+from src.processing.features import generate_train_df
+from src.recsys.evaluate import evaluate_model
+from src.recsys.model import RecipeModel
+
+logger = logging.getLogger(__name__)
+
+# Config sections each cached stage depends on, as dotted paths
+STAGE_DEPENDENCIES = {
+    "clean": ["processing.clean"],
+    "features": ["processing.clean", "processing.features"],
+}
+
+# Train and test sets shared by the sweep worker processes, set once per
+# worker by _init_sweep_worker
+_sweep_state = {}
+
+
+def get_path(config, path):
+    """Get a value from a nested config by its dotted path
+
+    Args:
+        config (`dict`): Nested configuration
+        path (`str`): Dotted path, e.g. "model.train.scale_const"
+
+    Returns:
+        any: Value at the path
+    """
+    return functools.reduce(lambda d, key: d[key], path.split("."), config)
+
+
+def set_path(config, path, value):
+    """Set a value in a nested config by its dotted path
+
+    Args:
+        config (`dict`): Nested configuration, modified in place
+        path (`str`): Dotted path, e.g. "model.train.scale_const"
+        value (any): New value
+    """
+    *parents, key = path.split(".")
+    get_path(config, ".".join(parents))[key] = value
+
+
+def expand_grid(config, grid):
+    """Build one config per combination of the grid values
+
+    Args:
+        config (`dict`): Base configuration
+        grid (`dict`): Dotted config path to the list of values to try
+
+    Returns:
+        `list`: Tuples of the swept values and the resulting config
+    """
+    runs = []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        run_config = copy.deepcopy(config)
+        for path, value in params.items():
+            set_path(run_config, path, value)
+        runs.append((params, run_config))
+
+    return runs
+
+
+def stage_keys(config, fingerprint):
+    """Cache keys of every stage of a run
+
+    Args:
+        config (`dict`): Run configuration
+        fingerprint (any): Identifies the train set, e.g. hashes of the
+        input file and split configuration
+
+    Returns:
+        `dict`: Stage name to cache key
+    """
+    return {
+        stage: config_hash(
+            fingerprint, [get_path(config, path) for path in paths]
+        )
+        for stage, paths in STAGE_DEPENDENCIES.items()
+    }
+
+
+def _init_sweep_worker(state):
+    """Store the shared train and test sets in a worker process
+
+    Args:
+        state (`dict`): Train set, test set and cache directory
+    """
+    _sweep_state.update(state)
+
+
+def _clean_task(task):
+    """Clean the train set and cache the result
+
+    Args:
+        task (`tuple`): Stage keys and run configuration
+    """
+    keys, config = task
+    df = clean(_sweep_state["train"], **config["processing"]["clean"])
+    write_pickle(
+        df, cache_path(_sweep_state["cache_dir"], "clean", keys["clean"])
+    )
+
+
+def _features_task(task):
+    """Featurize a cached clean train set and cache the result
+
+    Args:
+        task (`tuple`): Stage keys and run configuration
+    """
+    keys, config = task
+    cache_dir = _sweep_state["cache_dir"]
+    df = pd.read_pickle(cache_path(cache_dir, "clean", keys["clean"]))
+    df = generate_train_df(df, **config["processing"]["features"])
+    write_pickle(df, cache_path(cache_dir, "features", keys["features"]))
+
+
+def _evaluate_task(task):
+    """Train a model on a cached featurized train set and evaluate it on
+    the test set
+
+    Args:
+        task (`tuple`): Stage keys and run configuration
+
+    Returns:
+        `dict`: Top-1 and top-k correct classification rates
+    """
+    keys, config = task
+    df = pd.read_pickle(
+        cache_path(_sweep_state["cache_dir"], "features", keys["features"])
+    )
+
+    model = RecipeModel(**config["model"]["initialize"])
+    model.train(df, **config["model"]["train"])
+    metrics = evaluate_model(model, _sweep_state["test"])
+
+    return {"top_1": metrics["top_1"], "top_k": metrics["top_k"]}
+
+
+def sweep(train, test, config, grid, cache_dir, fingerprint, workers=None):
+    """Evaluate the model pipeline on every combination of a grid of
+    config values. Stages run one after the other across a pool of worker
+    processes. Clean and featurized train sets are cached on disk, keyed by
+    the config sections they depend on, so runs that only differ in model
+    parameters reuse them, within a sweep and across sweeps.
+
+    Args:
+        train (`list`): Raw train recipes
+        test (`list`): Raw test recipes
+        config (`dict`): Base configuration
+        grid (`dict`): Dotted config path to the list of values to try
+        cache_dir (`str`): Directory of the cached artifacts
+        fingerprint (any): Identifies the train set, e.g. hashes of the
+        input file and split configuration
+        workers (int, optional): Number of worker processes. Defaults to
+        None, one per CPU core.
+
+    Returns:
+        `pandas.DataFrame`: Swept values with the top-1 and top-k correct
+        classification rates, one row per run
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    runs = expand_grid(config, grid)
+    tasks = [
+        (stage_keys(run_config, fingerprint), run_config)
+        for _, run_config in runs
+    ]
+
+    workers = workers or multiprocessing.cpu_count()
+    logger.info("Sweeping %i runs on %i workers", len(runs), workers)
+    state = {"train": train, "test": test, "cache_dir": cache_dir}
+    with multiprocessing.Pool(
+        workers, initializer=_init_sweep_worker, initargs=(state,)
+    ) as pool:
+        stages = [("clean", _clean_task), ("features", _features_task)]
+        for stage, func in stages:
+            # Run every distinct artifact that is not cached yet once
+            pending = {}
+            for keys, run_config in tasks:
+                path = cache_path(cache_dir, stage, keys[stage])
+                if keys[stage] not in pending and not os.path.exists(path):
+                    pending[keys[stage]] = (keys, run_config)
+            logger.info("Running %i %s tasks", len(pending), stage)
+            pool.map(func, pending.values())
+
+        results = pool.map(_evaluate_task, tasks)
+
+    return pd.DataFrame(
+        [{**params, **result} for (params, _), result in zip(runs, results)]
+    )
@@ -0,0 +1,86 @@
+import os
+
+from src.cache import (
+    code_version,
+    is_fresh,
+    path_hash,
+    step_manifest,
+    write_manifest,
+)
+
+
+def write_files(tmp_path):
+    input_path = tmp_path / "clean.csv"
+    input_path.write_text("ingredient,cuisine\ngarlic,greek\n")
+    output = tmp_path / "full.csv"
+    output.write_text("ingredient,greek,ingr_sum\ngarlic,1,1\n")
+
+    return str(input_path), str(output)
+
+
+def test_is_fresh(tmp_path):
+    input_path, output = write_files(tmp_path)
+    manifest = step_manifest("features", input_path, [{"min_prevalence": 1}])
+
+    assert not is_fresh(output, manifest)
+
+    write_manifest(output, manifest)
+
+    assert is_fresh(output, manifest)
+
+
+def test_is_fresh_changed_config(tmp_path):
+    input_path, output = write_files(tmp_path)
+    manifest = step_manifest("features", input_path, [{"min_prevalence": 1}])
+    write_manifest(output, manifest)
+
+    changed = step_manifest("features", input_path, [{"min_prevalence": 2}])
+
+    assert not is_fresh(output, changed)
+
+
+def test_is_fresh_changed_input(tmp_path):
+    input_path, output = write_files(tmp_path)
+    manifest = step_manifest("features", input_path, [{"min_prevalence": 1}])
+    write_manifest(output, manifest)
+
+    with open(input_path, "a") as f:
+        f.write("salt,greek\n")
+    changed = step_manifest("features", input_path, [{"min_prevalence": 1}])
+
+    assert not is_fresh(output, changed)
+
+
+def test_is_fresh_modified_output(tmp_path):
+    input_path, output = write_files(tmp_path)
+    manifest = step_manifest("features", input_path, [{"min_prevalence": 1}])
+    write_manifest(output, manifest)
+
+    with open(output, "a") as f:
+        f.write("salt,1,1\n")
+
+    assert not is_fresh(output, manifest)
+
+
+def test_path_hash_directory(tmp_path):
+    os.mkdir(tmp_path / "model")
+    (tmp_path / "model" / "meta.json").write_text("{}")
+    test = path_hash(str(tmp_path / "model"))
+
+    (tmp_path / "model" / "meta.json").write_text('{"num_guesses": 3}')
+
+    assert path_hash(str(tmp_path / "model")) != test
+
+
+def test_code_version(tmp_path):
+    (tmp_path / "module.py").write_text("x = 1\n")
+    (tmp_path / "notes.txt").write_text("ignored\n")
+    test = code_version(str(tmp_path))
+
+    (tmp_path / "notes.txt").write_text("still ignored\n")
+
+    assert code_version(str(tmp_path)) == test
+
+    (tmp_path / "module.py").write_text("x = 2\n")
+
+    assert code_version(str(tmp_path)) != test
@@ -1,7 +1,16 @@
+import json
+
 import pytest
 import pandas as pd
 
-from src.processing.clean import regex_patterns, clean, clean_ingr
+from src.processing.clean import (
+    regex_patterns,
+    clean,
+    clean_ingr,
+    clean_sharded,
+    convert_json,
+    iter_json,
+)
 
 
 def test_clean_ingr():
@@ -24,12 +33,88 @@ def test_clean_ingr_empty():
     assert test == true
 
 
+def test_clean_ingr_memo():
+    memo = {}
+    patterns = [",.*$", "^.*fresh "]
+
+    clean_ingr(["butter,", "fresh basil"], patterns, memo=memo)
+    test = clean_ingr(
+        ["fresh basil", "butter,", "fresh fresh thyme"], patterns, memo=memo
+    )
+
+    assert test == ["basil", "butter", "thyme"]
+    assert memo == {
+        "butter,": "butter",
+        "fresh basil": "basil",
+        "fresh fresh thyme": "thyme",
+    }
+
+
 def test_clean_ingr_invalid():
     with pytest.raises(TypeError):
         test_list = [sum, type]
         clean_ingr(test_list, [",.*$", "^.*fresh "])
 
 
+def test_iter_json(tmp_path):
+    records = [
+        {"id": 1, "cuisine": "greek", "ingredients": ["feta", "olives"]},
+        {"id": 2, "cuisine": "thai", "ingredients": ["fish sauce, [1 tsp]"]},
+        {"id": 3, "cuisine": "korean", "ingredients": []},
+    ]
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(records, indent=2))
+
+    # Chunks smaller than a record force reading ahead
+    test = list(iter_json(path, chunk_size=7))
+
+    assert test == records
+
+
+def test_iter_json_lines(tmp_path):
+    records = [
+        {"id": 1, "cuisine": "greek", "ingredients": ["feta", "olives"]},
+        {"id": 2, "cuisine": "thai", "ingredients": ["fish sauce"]},
+    ]
+    path = tmp_path / "raw.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n")
+
+    test = list(iter_json(path))
+
+    assert test == records
+
+
+def test_iter_json_invalid(tmp_path):
+    path = tmp_path / "raw.json"
+    path.write_text('[{"id": 1}, {"id": ')
+
+    test = iter_json(path)
+
+    assert next(test) == {"id": 1}
+    with pytest.raises(json.JSONDecodeError):
+        next(test)
+
+
+def test_convert_json_invalid(tmp_path):
+    path = tmp_path / "raw.json"
+    path.write_text('[{"id": 1}, {"id": ')
+
+    assert convert_json(path) is None
+
+
+def test_clean_lazy():
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+    ]
+
+    test_df = clean(iter(test_dict), [",.*$"], ["fresh"])
+
+    true_df = clean(test_dict, [",.*$"], ["fresh"])
+
+    pd.testing.assert_frame_equal(true_df, test_df)
+
+
 def test_regex_patterns():
     test_list = ["fresh", "low-fat"]
     test = regex_patterns(test_list)
@@ -118,7 +203,9 @@ def test_clean():
 
     true_df_columns = ["ingredient", "cuisine"]
 
-    true_df = pd.DataFrame(data=true_df_values, columns=true_df_columns)
+    true_df = pd.DataFrame(
+        data=true_df_values, columns=true_df_columns
+    ).astype("category")
 
     pd.testing.assert_frame_equal(true_df, test_df)
 
@@ -132,7 +219,11 @@ def test_clean_empty_dict():
 
     true_df_columns = ["ingredient", "cuisine"]
 
-    true_df = pd.DataFrame(data=true_df_values, columns=true_df_columns)
+    true_df = pd.DataFrame(
+        data=true_df_values,
+        columns=true_df_columns,
+        index=pd.RangeIndex(0),
+    ).astype("category")
 
     pd.testing.assert_frame_equal(true_df, test_df)
 
@@ -184,6 +275,153 @@ def test_clean_wrong_attrs():
 
     true_df_columns = ["ingredient", "cuisine"]
 
-    true_df = pd.DataFrame(data=[], columns=true_df_columns)
+    true_df = pd.DataFrame(
+        data=[], columns=true_df_columns, index=pd.RangeIndex(0)
+    ).astype("category")
 
     pd.testing.assert_frame_equal(true_df, test_df)
+
+
+def test_clean_sharded():
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+        {"cuisine": "korean", "ingredients": []},
+        {"cuisine": "greek", "ingredients": ["olives", "feta"]},
+        {"cuisine": "indian", "ingredients": ["ghee", "fresh cilantro"]},
+    ]
+
+    test_df = clean_sharded(
+        test_dict, 2, patterns=[",.*$"], remove_words=["fresh"]
+    )
+
+    true_df = clean(test_dict, [",.*$"], ["fresh"])
+
+    pd.testing.assert_frame_equal(true_df, test_df)
+
+
+def test_clean_sharded_missing_attributes():
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+        {"cuisine": "greek", "ingredients": ["olives", "feta"]},
+        {"cuisine": "indian"},
+        {"cuisine": "indian", "ingredients": ["ghee", "fresh cilantro"]},
+        {"cuisine": "korean", "ingredients": ["kimchi"]},
+        {"cuisine": "mexican", "ingredients": ["cumin"]},
+        {"cuisine": "thai", "ingredients": ["lemongrass"]},
+    ]
+
+    # Shards starting at, ending at and holding the malformed record
+    for shards_per_worker in (1, 2, 4):
+        test_df = clean_sharded(
+            test_dict,
+            2,
+            shards_per_worker=shards_per_worker,
+            patterns=[",.*$"],
+            remove_words=["fresh"],
+        )
+
+        true_df = clean(test_dict, [",.*$"], ["fresh"])
+
+        pd.testing.assert_frame_equal(true_df, test_df)
+    assert set(test_df.ingredient) == {
+        "feta",
+        "oregano",
+        "fish sauce",
+        "olives",
+    }
+
+
+def test_clean_cache_dir(tmp_path):
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+    ]
+
+    true_df = clean(test_dict, [",.*$"], ["fresh"], cache_dir=tmp_path)
+
+    (path,) = tmp_path.iterdir()
+    assert json.loads(path.read_text()) == {
+        "feta": "feta",
+        "fresh oregano": "oregano",
+        "fish sauce, to taste": "fish sauce",
+    }
+
+    # Later runs look cleaned names up instead of cleaning them again
+    path.write_text(json.dumps({"feta": "cached feta"}))
+    test_df = clean(test_dict, [",.*$"], ["fresh"], cache_dir=tmp_path)
+
+    assert set(test_df.ingredient) == {"cached feta", "oregano", "fish sauce"}
+
+    # Different patterns or words use a different cache
+    test_df = clean(
+        test_dict, [",.*$"], ["fresh", "dried"], cache_dir=tmp_path
+    )
+
+    pd.testing.assert_frame_equal(true_df, test_df)
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_clean_sharded_cache_dir(tmp_path):
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+        {"cuisine": "greek", "ingredients": ["olives", "feta"]},
+        {"cuisine": "indian", "ingredients": ["ghee", "fresh cilantro"]},
+    ]
+
+    (tmp_path / "cache").mkdir()
+    clean(test_dict[:1], [",.*$"], ["fresh"], cache_dir=tmp_path / "cache")
+    (path,) = (tmp_path / "cache").iterdir()
+    path.write_text(json.dumps({"feta": "cached feta"}))
+
+    test_df = clean_sharded(
+        test_dict,
+        2,
+        shards_per_worker=2,
+        patterns=[",.*$"],
+        remove_words=["fresh"],
+        cache_dir=tmp_path / "cache",
+    )
+
+    true_df = clean(
+        test_dict, [",.*$"], ["fresh"], memo={"feta": "cached feta"}
+    )
+
+    pd.testing.assert_frame_equal(true_df, test_df)
+
+    # The names of every shard are written to the one cache file
+    assert json.loads(path.read_text()) == {
+        "feta": "cached feta",
+        "fresh oregano": "oregano",
+        "fish sauce, to taste": "fish sauce",
+        "olives": "olives",
+        "ghee": "ghee",
+        "fresh cilantro": "cilantro",
+    }
+
+
+def test_clean_pandas_engine():
+    test_dict = [
+        {"cuisine": "greek", "ingredients": ["feta", "fresh oregano"]},
+        {"cuisine": "thai", "ingredients": ["fish sauce, to taste"]},
+        {"cuisine": "korean", "ingredients": []},
+        {"cuisine": None, "ingredients": ["(1 can) chickpeas, drained"]},
+        {"cuisine": "greek", "ingredients": ["olives", "fresh feta"]},
+        {"ingredients": ["butter"]},
+        {"cuisine": "indian", "ingredients": ["ghee"]},
+    ]
+    patterns = ["^[(].*?[)] ", ",.*$"]
+
+    test_df = clean(test_dict, patterns, ["fresh"], engine="pandas")
+
+    true_df = clean(test_dict, patterns, ["fresh"])
+
+    pd.testing.assert_frame_equal(true_df, test_df)
+
+
+def test_clean_pandas_engine_invalid():
+    with pytest.raises(TypeError):
+        test_dict = [{"cuisine": "greek", "ingredients": [sum, type]}]
+        clean(test_dict, [",.*$"], ["fresh"], engine="pandas")
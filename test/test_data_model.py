@@ -0,0 +1,161 @@
+import importlib
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+from src.data_model import SessionManager, create_db, table_columns
+from src.recsys.model import RecipeModel
+
+train_df = pd.DataFrame(
+    data=[
+        [12.0, 0.0, 3.0, 15.0],
+        [1.0, 9.0, 2.0, 12.0],
+        [0.0, 4.0, 8.0, 12.0],
+        [5.0, 5.0, 0.0, 10.0],
+    ],
+    columns=["chinese", "italian", "mexican", "ingr_sum"],
+    index=["soy sauce", "basil", "cumin", "garlic"],
+)
+
+
+def trained_model():
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    return model
+
+
+def session_manager(tmp_path):
+    engine_string = f"sqlite:///{tmp_path / 'kitchen.db'}"
+    create_db(engine_string)
+    manager = SessionManager(engine_string=engine_string)
+    manager.bind_model(trained_model(), pretrained=True)
+
+    return manager
+
+
+def test_reload_model(tmp_path):
+    manager = session_manager(tmp_path)
+    new = trained_model()
+
+    thread = manager.reload_model(lambda: new, pretrained=True)
+    thread.join()
+
+    assert manager.model is new
+
+
+def test_reload_model_db(tmp_path):
+    manager = session_manager(tmp_path)
+    cuisines = table_columns[1:-1]
+    full = pd.DataFrame(
+        [[i + j for j in range(len(cuisines))] for i in range(3)],
+        columns=cuisines,
+        index=pd.Index(["basil", "cumin", "garlic"], name="ingredient"),
+    )
+    full["ingr_sum"] = full.sum(axis=1)
+    manager.add_df_to_db(full)
+
+    thread = manager.reload_model(
+        lambda: RecipeModel(num_guesses=2, num_ingredients=2),
+        scale_const=1000,
+        sum_column="ingr_sum",
+    )
+    thread.join()
+
+    assert list(manager.model.rec_train.index) == ["basil", "cumin", "garlic"]
+    assert list(manager.model.rec_train.columns) == cuisines
+
+
+def test_reload_model_failed(tmp_path):
+    manager = session_manager(tmp_path)
+    old = manager.model
+
+    def build():
+        raise RuntimeError("artifact not found")
+
+    manager.reload_model(build, pretrained=True).join()
+
+    assert manager.model is old
+
+    # The failed reload does not block the next one
+    new = trained_model()
+    manager.reload_model(lambda: new, pretrained=True).join()
+
+    assert manager.model is new
+
+
+def test_reload_model_busy(tmp_path):
+    manager = session_manager(tmp_path)
+    old = manager.model
+    new = trained_model()
+    started = threading.Event()
+    release = threading.Event()
+
+    def build():
+        started.set()
+        release.wait(timeout=10)
+        return new
+
+    thread = manager.reload_model(build, pretrained=True)
+    started.wait(timeout=10)
+
+    assert manager.reload_model(build, pretrained=True) is None
+    assert manager.model is old
+
+    release.set()
+    thread.join()
+
+    assert manager.model is new
+
+    # The lock is released once the reload is done
+    manager.reload_model(lambda: old, pretrained=True).join()
+
+    assert manager.model is old
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    trained_model().save(str(tmp_path / "model.npz"))
+    monkeypatch.setenv("MODEL_PATH", str(tmp_path / "model.npz"))
+    monkeypatch.setenv(
+        "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'kitchen.db'}"
+    )
+    monkeypatch.setenv("ALLOW_RELOAD", "False")
+    sys.modules.pop("app", None)
+
+    yield importlib.import_module("app")
+
+    sys.modules.pop("app", None)
+
+
+def test_reload_route(app_module, monkeypatch):
+    client = app_module.app.test_client()
+
+    assert client.post("/reload").status_code == 403
+
+    new = trained_model()
+    started = threading.Event()
+    release = threading.Event()
+
+    def build():
+        started.set()
+        release.wait(timeout=10)
+        return new
+
+    monkeypatch.setitem(app_module.app.config, "ALLOW_RELOAD", True)
+    monkeypatch.setattr(app_module, "new_model", build)
+
+    response = client.post("/reload")
+    started.wait(timeout=10)
+
+    assert response.status_code == 202
+    assert client.post("/reload").get_json() == {"status": "busy"}
+
+    release.set()
+    lock = app_module.manager._reload_lock
+    assert lock.acquire(timeout=10)
+    lock.release()
+
+    assert app_module.manager.model is new
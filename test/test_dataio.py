@@ -1,4 +1,13 @@
-from src.dataio import parse_s3
+import pandas as pd
+import pytest
+
+from src.dataio import (
+    iter_table,
+    parse_s3,
+    read_table,
+    table_format,
+    write_table,
+)
 
 
 def test_parse_s3():
@@ -17,3 +26,63 @@ def test_parse_s3_nonstr():
     test = parse_s3(input)
 
     assert test == (None, None)
+
+
+def test_table_format():
+    assert table_format("data/clean.parquet") == "parquet"
+    assert table_format("data/clean.csv") == "csv"
+    assert table_format("data/clean.csv", fmt="parquet") == "parquet"
+
+
+def test_table_format_invalid():
+    with pytest.raises(ValueError):
+        table_format("data/clean.csv", fmt="xlsx")
+
+
+def test_write_table_csv(tmp_path):
+    df = pd.DataFrame(
+        {"chinese": [1.0, 0.0], "ingr_sum": [1.0, 2.0]},
+        index=pd.Index(["garlic", "salt"], name="ingredient"),
+    )
+    path = str(tmp_path / "full.csv")
+
+    write_table(df, path, index=True)
+    test = read_table(path, index_col=0)
+
+    pd.testing.assert_frame_equal(test, df)
+
+
+def test_write_table_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {"chinese": [1.0, 0.0], "ingr_sum": [1.0, 2.0]},
+        index=pd.Index(["garlic", "salt"], name="ingredient"),
+    )
+    path = str(tmp_path / "full.parquet")
+
+    write_table(df, path, index=True)
+    test = read_table(path)
+
+    # Whole-number counts are stored as integers
+    true = df.astype("int64")
+
+    pd.testing.assert_frame_equal(test, true)
+
+
+def test_iter_table_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {
+            "ingredient": ["garlic", "salt", "garlic"],
+            "cuisine": ["greek", "greek", "thai"],
+        }
+    )
+    path = str(tmp_path / "clean.parquet")
+
+    write_table(df, path)
+    test = pd.concat(iter_table(path, 2), ignore_index=True)
+
+    # Strings are stored dictionary-encoded
+    true = df.astype("category")
+
+    pd.testing.assert_frame_equal(test, true)
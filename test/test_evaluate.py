@@ -0,0 +1,149 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.recsys.evaluate import (
+    cross_validate,
+    evaluate_model,
+    get_accuracy,
+    split_records,
+    stream_splits,
+)
+from src.recsys.model import RecipeModel
+
+
+def train_model():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    return model
+
+
+test_list = [
+    {"cuisine": "chinese", "ingredients": ["soy sauce", "garlic"]},
+    {"cuisine": "italian", "ingredients": ["basil", "not an ingredient"]},
+    {"cuisine": "mexican", "ingredients": ["soy sauce"]},
+    {"cuisine": "mexican", "ingredients": ["cumin", "basil"]},
+    {"cuisine": "chinese", "ingredients": ["cumin"]},
+]
+
+
+def test_evaluate_model():
+    model = train_model()
+
+    test = evaluate_model(model, test_list)
+
+    top = [list(model.predict(i["ingredients"]).index) for i in test_list]
+    hits = [i["cuisine"] in guesses for i, guesses in zip(test_list, top)]
+
+    assert test["top_1"] == pytest.approx(
+        sum(i["cuisine"] == g[0] for i, g in zip(test_list, top)) / 5
+    )
+    assert test["top_k"] == pytest.approx(sum(hits) / 5)
+    assert test["per_cuisine"] == pytest.approx(
+        {
+            "chinese": (hits[0] + hits[4]) / 2,
+            "italian": hits[1] / 1,
+            "mexican": (hits[2] + hits[3]) / 2,
+        }
+    )
+
+
+def test_get_accuracy():
+    model = train_model()
+
+    test = get_accuracy(model, test_list)
+
+    true = sum(
+        i["cuisine"] in list(model.predict(i["ingredients"]).index)
+        for i in test_list
+    ) / len(test_list)
+
+    assert test == pytest.approx(true)
+
+
+def test_get_accuracy_corrupted():
+    model = train_model()
+
+    assert get_accuracy(model, [{"ingredients": ["cumin"]}]) is None
+    assert get_accuracy(model, []) is None
+
+
+def test_cross_validate():
+    records = [
+        {"cuisine": cuisine, "ingredients": ingredients}
+        for cuisine, ingredients in [
+            ("chinese", ["soy sauce", "garlic"]),
+            ("chinese", ["soy sauce", "ginger"]),
+            ("chinese", ["fresh ginger", "soy sauce"]),
+            ("italian", ["basil", "garlic"]),
+            ("italian", ["basil", "tomato"]),
+            ("italian", ["tomato", "garlic, minced"]),
+        ]
+    ]
+
+    test = cross_validate(
+        records,
+        {"patterns": [",.*$"], "remove_words": ["fresh"]},
+        {"min_prevalence": 0, "sum_column": "ingr_sum"},
+        {"num_guesses": 1, "num_ingredients": 2},
+        {"scale_const": 1000, "sum_column": "ingr_sum"},
+        n_splits=3,
+        random_state=666,
+        workers=2,
+    )
+
+    assert list(test.index) == [0, 1, 2, "mean", "std"]
+    assert list(test.columns[:2]) == ["top_1", "top_k"]
+    assert test.loc["mean", "top_1"] == pytest.approx(
+        test.loc[[0, 1, 2], "top_1"].mean()
+    )
+    assert test.loc[[0, 1, 2], "top_k"].between(0, 1).all()
+
+
+def test_stream_splits(tmp_path):
+    records = [{"id": i, "cuisine": "greek"} for i in range(200)]
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(records))
+    train_path = tmp_path / "train.json"
+    test_path = tmp_path / "test.json"
+
+    sizes = stream_splits(path, train_path, test_path, random_state=666)
+
+    train = json.loads(train_path.read_text())
+    test = json.loads(test_path.read_text())
+
+    assert sizes == (len(train), len(test))
+    assert sorted(r["id"] for r in train + test) == list(range(200))
+    assert 120 < len(train) < 190
+
+    # Same seed, same split
+    stream_splits(path, train_path, tmp_path / "again.json", 666)
+
+    assert json.loads(train_path.read_text()) == train
+
+
+def test_split_records(tmp_path):
+    records = [{"id": i, "cuisine": "greek"} for i in range(200)]
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(records))
+    train_path = tmp_path / "train.json"
+    test_path = tmp_path / "test.json"
+    stream_splits(path, train_path, test_path, random_state=666)
+
+    train, test = split_records(records, random_state=666)
+
+    assert train == json.loads(train_path.read_text())
+    assert test == json.loads(test_path.read_text())
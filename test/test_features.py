@@ -1,7 +1,11 @@
 import pytest
 import pandas as pd
 
-from src.processing.features import ingr_sum, generate_train_df
+from src.processing.features import (
+    chunked_train_df,
+    generate_train_df,
+    ingr_sum,
+)
 
 
 def test_ingr_sum():
@@ -309,3 +313,114 @@ def test_generate_train_df():
 def test_generate_train_df_empty():
     with pytest.raises(KeyError):
         generate_train_df(pd.DataFrame([]))
+
+
+def test_generate_train_df_sparse():
+
+    test_values = [
+        ["red pepper", "mexican"],
+        ["olive oil", "southern_us"],
+        ["red pepper", "mexican"],
+        ["garlic cloves", "chinese"],
+        ["red pepper", "chinese"],
+        ["olive oil", "italian"],
+        ["garlic cloves", "italian"],
+        ["olive oil", "italian"],
+    ]
+    test_columns = ["ingredient", "cuisine"]
+
+    test_input = pd.DataFrame(data=test_values, columns=test_columns)
+
+    test = generate_train_df(
+        test_input,
+        drop_rows=["garlic cloves"],
+        min_prevalence=0,
+        sum_column="ingr_sum",
+        sparse=True,
+    )
+
+    true = generate_train_df(
+        test_input,
+        drop_rows=["garlic cloves"],
+        min_prevalence=0,
+        sum_column="ingr_sum",
+    )
+
+    assert all(isinstance(dtype, pd.SparseDtype) for dtype in test.dtypes)
+    pd.testing.assert_frame_equal(test.sparse.to_dense(), true)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_generate_train_df_categorical(sparse):
+
+    test_values = [
+        ["red pepper", "mexican"],
+        ["olive oil", "southern_us"],
+        ["red pepper", "mexican"],
+        ["garlic cloves", "chinese"],
+        ["red pepper", "chinese"],
+        ["olive oil", "italian"],
+    ]
+    test_columns = ["ingredient", "cuisine"]
+
+    test_input = pd.DataFrame(data=test_values, columns=test_columns)
+
+    # Unused categories, as left over by subsetting a cleaned dataframe
+    categorical_input = test_input.astype(
+        {
+            "ingredient": pd.CategoricalDtype(
+                ["basil", "garlic cloves", "olive oil", "red pepper"]
+            ),
+            "cuisine": pd.CategoricalDtype(
+                ["chinese", "greek", "italian", "mexican", "southern_us"]
+            ),
+        }
+    )
+
+    test = generate_train_df(
+        categorical_input,
+        min_prevalence=0,
+        sum_column="ingr_sum",
+        sparse=sparse,
+    )
+
+    true = generate_train_df(
+        test_input, min_prevalence=0, sum_column="ingr_sum", sparse=sparse
+    )
+
+    pd.testing.assert_frame_equal(test, true)
+
+
+def test_chunked_train_df():
+
+    test_values = [
+        ["red pepper", "mexican"],
+        ["olive oil", "southern_us"],
+        ["red pepper", "mexican"],
+        ["garlic cloves", "chinese"],
+        [None, "chinese"],
+        ["red pepper", "chinese"],
+        ["olive oil", "italian"],
+        ["garlic cloves", None],
+        ["olive oil", "italian"],
+    ]
+    test_columns = ["ingredient", "cuisine"]
+
+    test_input = pd.DataFrame(data=test_values, columns=test_columns)
+
+    chunks = (test_input.iloc[i : i + 2] for i in range(0, 9, 2))
+    test = chunked_train_df(
+        chunks,
+        drop_rows=["garlic cloves"],
+        min_prevalence=1,
+        sum_column="ingr_sum",
+    )
+
+    true = generate_train_df(
+        test_input,
+        drop_rows=["garlic cloves"],
+        min_prevalence=1,
+        sum_column="ingr_sum",
+    )
+
+    pd.testing.assert_frame_equal(test, true)
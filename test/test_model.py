@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pytest
 
-from src.recsys.model import mean_center, normalize, softmax
+from src.processing.features import generate_train_df
+from src.recsys.model import RecipeModel, mean_center, normalize, softmax
 
 
 def test_mean_center():
@@ -297,3 +299,366 @@ def test_softmax_empty():
     true = pd.Series([], dtype="object")
 
     pd.testing.assert_series_equal(test, true)
+
+
+def test_predict():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    test = model.predict(["basil", "cumin", "not an ingredient"])
+
+    # Same computation through the trained dataframe
+    calc = (
+        model.pred_train.loc[["basil", "cumin"]]
+        .drop("ingr_sum", axis=1)
+        .sum(axis=0)
+    )
+    true = softmax(calc).sort_values(ascending=False)[:2]
+
+    pd.testing.assert_series_equal(test, true)
+    assert list(test.index) == ["mexican", "italian"]
+
+
+def test_recommend():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    test = model.recommend("italian", selected=["basil", "cumin"])
+
+    assert test == ["garlic", "soy sauce"]
+
+    # Like dropping rows by label, an unknown ingredient drops nothing
+    test = model.recommend("italian", selected=["basil", "not an ingredient"])
+
+    assert test == ["garlic", "basil"]
+
+
+def test_recommend_ties():
+    rng = np.random.default_rng(0)
+    train_df = pd.DataFrame(
+        rng.poisson(0.3, size=(60, 3)).astype(float),
+        columns=["chinese", "italian", "mexican"],
+        index=[f"ingr{i}" for i in range(60)],
+    )
+    train_df["ingr_sum"] = train_df.sum(axis=1)
+
+    model = RecipeModel(num_guesses=2, num_ingredients=5)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    for size in [0, 1, 3, 10]:
+        selected = list(rng.choice(train_df.index, size, replace=False))
+        for cuisine in ["chinese", "italian", "mexican"]:
+            test = model.recommend(cuisine, selected=selected)
+
+            # Same tie order as sorting the column with the rows dropped
+            ordered = (
+                model.rec_train.drop(labels=selected, axis=0)
+                .loc[:, cuisine]
+                .sort_values(ascending=False)
+            )
+
+            assert test == list(ordered.index[:5])
+
+
+def test_predict_batch():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    test_recipes = [
+        ["basil", "cumin", "not an ingredient"],
+        ["soy sauce", "garlic"],
+        ["cumin"],
+        ["basil", "basil", "cumin"],
+    ]
+
+    test = model.predict_batch(test_recipes)
+
+    true = [list(model.predict(recipe).index) for recipe in test_recipes]
+
+    assert test == true
+
+
+def test_predict_batch_overflow():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=10000, sum_column="ingr_sum")
+
+    test_recipes = [
+        ["soy sauce"],
+        ["basil", "cumin"],
+        ["cumin", "garlic"],
+        ["soy sauce", "garlic"],
+    ]
+
+    test = model.predict_batch(test_recipes)
+
+    true = [list(model.predict(recipe).index) for recipe in test_recipes]
+
+    assert test == true
+    # Scores above ~709 overflow to a NaN softmax, which ranks last
+    assert "chinese" not in test[0]
+
+
+def test_train():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    # Same train sets through the column and row helpers
+    true_pred = train_df.apply(
+        normalize, exclude=["ingr_sum"], scale=1000, axis=0
+    ).apply(mean_center, raw=True, axis=1)
+    true_rec = train_df.drop("ingr_sum", axis=1).apply(
+        mean_center, raw=True, axis=0
+    )
+
+    pd.testing.assert_frame_equal(
+        model.pred_train, true_pred, check_exact=True
+    )
+    pd.testing.assert_frame_equal(model.rec_train, true_rec, check_exact=True)
+
+
+def test_save_load(tmp_path):
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=pd.Index(["chinese", "italian", "mexican", "ingr_sum"]),
+        index=pd.Index(
+            ["soy sauce", "basil", "cumin", "garlic"], name="ingredient"
+        ),
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+    model.save(str(tmp_path / "model.npz"))
+
+    test = RecipeModel.load(str(tmp_path / "model.npz"))
+
+    pd.testing.assert_frame_equal(test.pred_train, model.pred_train)
+    pd.testing.assert_frame_equal(test.rec_train, model.rec_train)
+    assert test.predict_and_recommend(
+        ["basil", "garlic"]
+    ) == model.predict_and_recommend(["basil", "garlic"])
+
+
+def test_load_mmap(tmp_path):
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=pd.Index(["chinese", "italian", "mexican", "ingr_sum"]),
+        index=pd.Index(
+            ["soy sauce", "basil", "cumin", "garlic"], name="ingredient"
+        ),
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+    model.save(str(tmp_path / "model"))
+
+    test = RecipeModel.load(str(tmp_path / "model"), mmap=True)
+
+    for selected in [["basil", "garlic"], ["cumin", "not an ingredient"]]:
+        assert test.predict_and_recommend(
+            selected, request=True
+        ) == model.predict_and_recommend(selected, request=True)
+    assert test.predict_batch(
+        [["basil"], ["soy sauce", "cumin"]]
+    ) == model.predict_batch([["basil"], ["soy sauce", "cumin"]])
+    pd.testing.assert_frame_equal(test.pred_train, model.pred_train)
+    pd.testing.assert_frame_equal(test.rec_train, model.rec_train)
+
+
+def test_partial_fit():
+    def clean_df(pairs):
+        return pd.DataFrame(pairs, columns=["ingredient", "cuisine"])
+
+    old_df = clean_df(
+        [("soy sauce", "chinese")] * 6
+        + [("garlic", "chinese")] * 2
+        + [("garlic", "italian")] * 5
+        + [("basil", "italian")] * 4
+        + [("cumin", "mexican")] * 5
+        + [("basil", "mexican")] * 2
+    )
+    # No chinese recipes, a new cuisine and an ingredient sorted in between
+    new_df = clean_df(
+        [("garlic", "thai")] * 3
+        + [("lemongrass", "thai")] * 5
+        + [("cumin", "italian")] * 2
+    )
+    features_kwargs = {"min_prevalence": 0, "sum_column": "ingr_sum"}
+    train_kwargs = {
+        "scale_const": 1000,
+        "sum_column": "ingr_sum",
+        "min_prevalence": 4,
+    }
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(generate_train_df(old_df, **features_kwargs), **train_kwargs)
+    model.partial_fit(generate_train_df(new_df, **features_kwargs))
+
+    # Same model as retraining on all the recipes
+    true = RecipeModel(num_guesses=2, num_ingredients=2)
+    true.train(
+        generate_train_df(
+            pd.concat([old_df, new_df], ignore_index=True), **features_kwargs
+        ),
+        **train_kwargs,
+    )
+
+    pd.testing.assert_frame_equal(
+        model.pred_train, true.pred_train, check_exact=True
+    )
+    pd.testing.assert_frame_equal(
+        model.rec_train, true.rec_train, check_exact=True
+    )
+    assert list(model.pred_train.index) == [
+        "basil",
+        "cumin",
+        "garlic",
+        "lemongrass",
+    ]
+    for ingredients in [["cumin"], ["garlic", "basil"]]:
+        assert model.predict_and_recommend(
+            ingredients
+        ) == true.predict_and_recommend(ingredients)
+
+
+def test_predict_and_recommend_cache():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2, cache_size=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    first = model.predict_and_recommend(["basil", "cumin"], request=True)
+    test = model.predict_and_recommend(["cumin", "basil"], request=True)
+    model.predict_and_recommend(["basil", "cumin"])
+    model.predict_and_recommend(["garlic"])
+
+    assert test == first
+
+    # Repeated ingredients count twice, and are cached separately
+    model.predict_and_recommend(["cumin", "basil", "cumin", "cumin"])
+    uncached = RecipeModel(num_guesses=2, num_ingredients=2)
+    uncached.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    assert model.predict_and_recommend(
+        ["basil", "cumin", "cumin", "cumin"]
+    ) == uncached.predict_and_recommend(["basil", "cumin", "cumin", "cumin"])
+    assert model.cache_info() == {
+        "hits": 2,
+        "misses": 4,
+        "evictions": 2,
+        "size": 2,
+        "maxsize": 2,
+    }
+
+    # Retraining invalidates cached results
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    assert model.cache_info()["size"] == 0
+
+
+def test_train_sparse():
+    train_df = pd.DataFrame(
+        data=[
+            [12.0, 0.0, 3.0, 15.0],
+            [1.0, 9.0, 2.0, 12.0],
+            [0.0, 4.0, 8.0, 12.0],
+            [5.0, 5.0, 0.0, 10.0],
+        ],
+        columns=["chinese", "italian", "mexican", "ingr_sum"],
+        index=["soy sauce", "basil", "cumin", "garlic"],
+    )
+
+    model = RecipeModel(num_guesses=2, num_ingredients=2)
+    model.train(train_df, scale_const=1000, sum_column="ingr_sum")
+
+    test = RecipeModel(num_guesses=2, num_ingredients=2)
+    test.train(
+        train_df.astype(pd.SparseDtype("float64", 0)),
+        scale_const=1000,
+        sum_column="ingr_sum",
+    )
+
+    for selected in [["basil", "cumin"], ["soy sauce"], ["garlic", "x"]]:
+        pd.testing.assert_series_equal(
+            test.predict(selected), model.predict(selected)
+        )
+        assert test.recommend("mexican", selected) == model.recommend(
+            "mexican", selected
+        )
+    assert test.predict_batch(
+        [["basil"], ["soy sauce", "cumin"]]
+    ) == model.predict_batch([["basil"], ["soy sauce", "cumin"]])
+    assert test.pred_train is None
@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.pipeline import run_pipeline
+from src.processing.clean import clean
+from src.processing.features import generate_train_df
+from src.recsys.model import RecipeModel
+
+config = {
+    "processing": {
+        "clean": {
+            "patterns": [",.*$"],
+            "remove_words": ["fresh"],
+            "cuisine_attr": "cuisine",
+            "ingredients_attr": "ingredients",
+            "cuisine_col": "cuisine",
+            "ingredient_col": "ingredient",
+        },
+        "features": {"min_prevalence": 0, "sum_column": "ingr_sum"},
+    },
+    "model": {
+        "initialize": {"num_guesses": 1, "num_ingredients": 2},
+        "train": {"scale_const": 1000, "sum_column": "ingr_sum"},
+        "evaluate": {"splits": {"random_state": 666, "train_size": 0.8}},
+    },
+}
+
+records = [
+    {"id": i, "cuisine": cuisine, "ingredients": ingredients}
+    for i, (cuisine, ingredients) in enumerate(
+        [
+            ("chinese", ["soy sauce", "garlic"]),
+            ("chinese", ["soy sauce", "ginger"]),
+            ("chinese", ["fresh ginger", "soy sauce"]),
+            ("italian", ["basil", "garlic"]),
+            ("italian", ["basil", "tomato"]),
+            ("italian", ["tomato", "garlic, minced"]),
+        ]
+        * 5
+    )
+]
+
+
+def test_run_pipeline(tmp_path):
+    input_path = tmp_path / "raw.json"
+    input_path.write_text(json.dumps(records))
+
+    report = run_pipeline(
+        str(input_path),
+        config,
+        model_path=str(tmp_path / "model.npz"),
+        result_path=str(tmp_path / "result.txt"),
+        features_path=str(tmp_path / "full.csv"),
+    )
+
+    assert list(report.index) == [
+        "read",
+        "clean",
+        "features",
+        "train",
+        "evaluate",
+        "save",
+    ]
+    assert (report["seconds"] >= 0).all()
+    assert (report["peak_rss_mb"] > 0).all()
+    assert (tmp_path / "result.txt").read_text().startswith("Accuracy: ")
+
+    # Same table and model as the separate clean, features and train steps
+    true = generate_train_df(
+        clean(records, **config["processing"]["clean"]),
+        **config["processing"]["features"],
+    )
+    test = pd.read_csv(tmp_path / "full.csv", index_col=0)
+
+    pd.testing.assert_frame_equal(test, true, check_names=False)
+
+    model = RecipeModel(**config["model"]["initialize"])
+    model.train(true, **config["model"]["train"])
+    saved = RecipeModel.load(str(tmp_path / "model.npz"))
+
+    np.testing.assert_array_equal(
+        saved.predict_batch([["soy sauce"], ["basil", "garlic"]]),
+        model.predict_batch([["soy sauce"], ["basil", "garlic"]]),
+    )
+
+
+def test_run_pipeline_sparse(tmp_path):
+    input_path = tmp_path / "raw.json"
+    input_path.write_text(json.dumps(records))
+    sparse_config = {
+        **config,
+        "processing": {
+            **config["processing"],
+            "features": {**config["processing"]["features"], "sparse": True},
+        },
+    }
+
+    run_pipeline(
+        str(input_path),
+        config,
+        model_path=str(tmp_path / "model.npz"),
+        result_path=str(tmp_path / "result.txt"),
+    )
+    run_pipeline(
+        str(input_path),
+        sparse_config,
+        model_path=str(tmp_path / "sparse.npz"),
+        result_path=str(tmp_path / "sparse.txt"),
+        features_path=str(tmp_path / "sparse.csv"),
+    )
+
+    # The saved model and table are the same as without sparse features
+    assert (tmp_path / "sparse.txt").read_text() == (
+        tmp_path / "result.txt"
+    ).read_text()
+
+    model = RecipeModel.load(str(tmp_path / "model.npz"))
+    saved = RecipeModel.load(str(tmp_path / "sparse.npz"))
+
+    np.testing.assert_array_equal(
+        saved.predict_batch([["soy sauce"], ["basil", "garlic"]]),
+        model.predict_batch([["soy sauce"], ["basil", "garlic"]]),
+    )
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from src.cache import config_hash
+from src.recsys.sweep import expand_grid, stage_keys, sweep
+
+config = {
+    "processing": {
+        "clean": {"patterns": [",.*$"], "remove_words": ["fresh"]},
+        "features": {"min_prevalence": 0, "sum_column": "ingr_sum"},
+    },
+    "model": {
+        "initialize": {"num_guesses": 1, "num_ingredients": 2},
+        "train": {"scale_const": 1000, "sum_column": "ingr_sum"},
+    },
+}
+
+
+def test_config_hash():
+    assert config_hash({"a": 1, "b": [2]}) == config_hash({"b": [2], "a": 1})
+    assert config_hash({"a": 1}) != config_hash({"a": 2})
+
+
+def test_expand_grid():
+    grid = {
+        "model.train.scale_const": [100, 1000],
+        "processing.features.min_prevalence": [0, 1, 2],
+    }
+
+    test = expand_grid(config, grid)
+
+    assert len(test) == 6
+    assert test[1][0] == {
+        "model.train.scale_const": 100,
+        "processing.features.min_prevalence": 1,
+    }
+    assert test[1][1]["processing"]["features"]["min_prevalence"] == 1
+    assert config["processing"]["features"]["min_prevalence"] == 0
+
+
+def test_stage_keys():
+    grid = {
+        "model.train.scale_const": [100, 1000],
+        "processing.features.min_prevalence": [0, 1],
+    }
+
+    test = [
+        stage_keys(run_config, "x")
+        for _, run_config in expand_grid(config, grid)
+    ]
+
+    # Model parameters do not invalidate cleaned or featurized data
+    assert len({keys["clean"] for keys in test}) == 1
+    assert len({keys["features"] for keys in test}) == 2
+    assert test[0] == test[2]
+
+
+def test_sweep(tmp_path):
+    train = [
+        {"cuisine": "chinese", "ingredients": ["soy sauce", "garlic"]},
+        {"cuisine": "chinese", "ingredients": ["fresh ginger", "soy sauce"]},
+        {"cuisine": "italian", "ingredients": ["basil", "garlic, minced"]},
+        {"cuisine": "italian", "ingredients": ["basil", "tomato"]},
+    ]
+    test = [
+        {"cuisine": "chinese", "ingredients": ["ginger"]},
+        {"cuisine": "italian", "ingredients": ["tomato", "garlic"]},
+    ]
+    grid = {"model.initialize.num_guesses": [1, 2]}
+
+    results = sweep(train, test, config, grid, str(tmp_path), "x", workers=2)
+
+    assert list(results.columns) == [
+        "model.initialize.num_guesses",
+        "top_1",
+        "top_k",
+    ]
+    assert results["top_1"].tolist() == pytest.approx([1.0, 1.0])
+    assert results["top_k"].tolist() == pytest.approx([1.0, 1.0])
+    assert len(os.listdir(tmp_path)) == 2